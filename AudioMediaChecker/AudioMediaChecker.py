@@ -4,16 +4,19 @@ import signal
 import sys
 import subprocess
 import json
-import random
 import logging
-from faster_whisper import WhisperModel
-from pydub import AudioSegment
-import pycountry
-import io
+import sqlite3
+import mmap
+import struct
 from pathlib import Path
-import psutil
-from tqdm import tqdm
 import datetime
+import threading
+import time
+import itertools
+import collections
+import queue
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 def _setup_logger(verbose=False, json=False):
     """
@@ -44,53 +47,1394 @@ def _setup_logger(verbose=False, json=False):
     
     return logger
 
-def find_files(folder_path: Path, max_depth: int, current_level: int = 0, dry_run: bool = False):
+# Persistent state (caches, journals) lives next to the models, on the volume mapped to /models
+DEFAULT_STATE_DIR = Path('/models')
+DEFAULT_CACHE_PATH = DEFAULT_STATE_DIR / 'audiomediachecker_cache.sqlite'
+DEFAULT_JOURNAL_PATH = DEFAULT_STATE_DIR / 'audiomediachecker_journal.json'
+DEFAULT_CHECKPOINT_PATH = DEFAULT_STATE_DIR / 'audiomediachecker_checkpoint.jsonl'
+
+# faster_whisper, numpy, pycountry, psutil and tqdm are imported where they are first needed:
+# a run with nothing to analyze (or --help-languages, --server) never pays for them.
+# The same goes for multiprocessing (--workers), http.server (--serve) and urllib (--server).
+
+# Whisper models loaded in this process, shared by every AudioMediaChecker.
+# Key: (model size, device, compute_type, cpu_threads) -> loaded WhisperModel
+_whisper_models = {}
+_whisper_models_lock = threading.Lock()
+
+# Verdicts of the audio fingerprints seen by this process (--dedup).
+# Key: (fingerprint, model size) -> (language, confidence)
+_fingerprint_verdicts = {}
+_fingerprint_verdicts_lock = threading.Lock()
+
+# Set by SIGINT/SIGTERM: every AudioMediaChecker of the process stops at the next round (see _handle_stop_signal)
+_stop_requested = threading.Event()
+# Set by a second signal: the run is aborted without waiting for the running analyses
+_abort_requested = threading.Event()
+# In a --workers process: the stop requests of the parent (multiprocessing Event, see _init_worker)
+_forwarded_stop = None
+
+# Memory taken by a loaded Whisper model with int8 weights, runtime buffers included (GB)
+MODEL_MEMORY_GB = {'tiny': 0.5, 'base': 0.7, 'small': 1.3, 'medium': 3.0, 'large': 5.5, 'large-v3': 5.5}
+# Memory used by a worker besides the model: interpreter, PCM buffers, pipes (GB)
+WORKER_OVERHEAD_GB = 0.4
+# Inference threads every worker gets at least, when the number of workers is chosen automatically
+MIN_THREADS_PER_WORKER = 4
+
+def system_resources():
+    """
+    Returns (available memory in GB, CPU cores).
+    """
+    try:
+        import psutil
+        available_gb = psutil.virtual_memory().available / (1024 ** 3)
+    except Exception:
+        available_gb = 4.0  # Conservative value if the memory cannot be determined.
+    return available_gb, os.cpu_count() or 4
+
+def plan_resources(model, gpu=False, workers=1, cpu_threads=None, degrade_model=False,
+                   available_gb=None, cores=None, cascade_model=None):
+    """
+    Chooses together the Whisper model, its compute type, the inference threads of each model and
+    the number of concurrent workers, from the available memory and the CPU cores.
+
+    - compute_type: int8 on CPU (the fastest CTranslate2 path, language identification does not
+      lose accuracy), int8_float16 on GPU.
+    - workers: the requested ones (0 = one every MIN_THREADS_PER_WORKER cores) that fit in memory.
+    - threads: the cores shared among the workers, unless cpu_threads is given.
+    - model: if not even one worker fits, the largest smaller model that does with degrade_model,
+      otherwise MemoryError.
+
+    Arguments:
+      available_gb, cores (float, int): override the detected resources.
+      cascade_model (str): first-tier model of --cascade, resident next to the main one.
+
+    Returns:
+      dict: 'model', 'compute_type', 'cpu_threads' (0 on GPU: automatic), 'workers' and
+            'notes' (the adjustments made, to be logged).
+    """
+    detected_gb, detected_cores = system_resources()
+    available_gb = detected_gb if available_gb is None else available_gb
+    cores = detected_cores if cores is None else cores
+
+    notes = []
+    while True:
+        worker_gb = MODEL_MEMORY_GB.get(model, 1.0) + WORKER_OVERHEAD_GB
+        if cascade_model:
+            worker_gb += MODEL_MEMORY_GB.get(cascade_model, 1.0)
+        fitting_workers = int(available_gb // worker_gb)
+        if fitting_workers >= 1:
+            break
+        smaller = [m for m, gb in MODEL_MEMORY_GB.items() if gb < MODEL_MEMORY_GB.get(model, 1.0)]
+        if not degrade_model or not smaller:
+            raise MemoryError(f"Il modello {model} richiede almeno {worker_gb:.1f}GB di RAM disponibile "
+                              f"({available_gb:.1f}GB liberi)")
+        notes.append(f"Model '{model}' does not fit in {available_gb:.1f}GB of available memory, using '{smaller[-1]}'")
+        model = smaller[-1]
+
+    requested_workers = workers if workers else max(1, cores // MIN_THREADS_PER_WORKER)
+    planned_workers = min(requested_workers, fitting_workers)
+    if planned_workers < requested_workers:
+        notes.append(f"Only {planned_workers} of {requested_workers} workers fit in {available_gb:.1f}GB of available memory")
+
+    return {
+        'model': model,
+        'compute_type': 'int8_float16' if gpu else 'int8',
+        'cpu_threads': 0 if gpu else (cpu_threads or max(1, cores // planned_workers)),
+        'workers': planned_workers,
+        'notes': notes
+    }
+
+def load_whisper_model(key, logger):
+    """
+    Returns the Whisper model of a configuration from the registry, loading it on first use.
+
+    Arguments:
+      key (tuple): (model size, device, compute_type, cpu_threads), see AudioMediaChecker.whisper_key.
+      logger (logging.Logger): logger.
+
+    Returns:
+      tuple: (WhisperModel, seconds spent loading it, 0 if it was already loaded)
+    """
+    model_size, device, compute_type, cpu_threads = key
+    with _whisper_models_lock:
+        model = _whisper_models.get(key)
+        if model is not None:
+            logger.debug(f"Reusing Whisper model '{model_size}' already loaded on {device}")
+            return model, 0.0
+
+        logger.info(f"Loading Whisper model '{model_size}' on {device}...")
+        logger.debug(f"Whisper configuration: compute_type={compute_type}, threads={cpu_threads or 'auto'}")
+
+        start = time.perf_counter()
+        from faster_whisper import WhisperModel
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            download_root="/models"  # persist weights if volume-mapped
+        )
+        load_seconds = time.perf_counter() - start
+        _whisper_models[key] = model
+
+        logger.info(f"Whisper model loaded in {load_seconds:.2f}s.")
+        return model, load_seconds
+
+# Extensions searched by find_files: every video format in dry-run mode, only mkv otherwise
+VIDEO_EXTENSIONS = frozenset({'.mkv', '.mp4', '.avi', '.mov', '.m4v', '.flv', '.wmv', '.webm'})
+MKV_EXTENSIONS = frozenset({'.mkv'})
+# Files the native Matroska reader can handle
+MATROSKA_EXTENSIONS = frozenset({'.mkv', '.webm'})
+
+def find_files(folder_path: Path, max_depth, dry_run: bool = False):
     """
     Search for video files in 'folder_path' by exploring to the specified depth.
+
+    The tree is walked once with os.scandir and the files are yielded as soon as they are found,
+    so processing can start while the walk is still running. Within a directory the entries are
+    visited in name order; symlinked directories are not followed (no loops).
     
     Arguments:
       folder_path (Path): starting directory.
       max_depth (int): depth levels to explore;
+                       if None, only the starting directory is searched (no recursion).
                        if 0, includes all subdirectories (unlimited recursion).
-                       If > 0, only sub-levels such that current_level < max_depth are explored,
+                       If > 0, only sub-levels such that level < max_depth are explored,
                        where the starting directory equals level 0.
-      current_level (int): current level in recursion (not to be set from outside).
       dry_run (bool): if True, searches for all video formats; if False, only .mkv files.
 
+    Yields:
+      Path: files found.
+    """
+    extensions = VIDEO_EXTENSIONS if dry_run else MKV_EXTENSIONS
+
+    # Depth-first walk with an explicit stack: (directory, level)
+    stack = [(str(folder_path), 0)]
+    while stack:
+        directory, level = stack.pop()
+        explore_subdirs = max_depth is not None and (max_depth == 0 or level < max_depth)
+
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if explore_subdirs:
+                        subdirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                    yield Path(entry.path)
+            except OSError:
+                continue
+
+        # Reversed so that the subdirectories are popped in name order
+        stack.extend((subdir, level + 1) for subdir in reversed(subdirs))
+
+# Matroska (EBML) element IDs used by read_matroska_info
+_EBML_HEADER = 0x1A45DFA3
+_EBML_DOCTYPE = 0x4282
+_MKV_SEGMENT = 0x18538067
+_MKV_SEEKHEAD = 0x114D9B74
+_MKV_SEEK = 0x4DBB
+_MKV_SEEK_ID = 0x53AB
+_MKV_SEEK_POSITION = 0x53AC
+_MKV_INFO = 0x1549A966
+_MKV_TIMECODE_SCALE = 0x2AD7B1
+_MKV_DURATION = 0x4489
+_MKV_TRACKS = 0x1654AE6B
+_MKV_TRACK_ENTRY = 0xAE
+_MKV_TRACK_TYPE = 0x83
+_MKV_CODEC_ID = 0x86
+_MKV_LANGUAGE = 0x22B59C
+_MKV_AUDIO = 0xE1
+_MKV_CHANNELS = 0x9F
+_MKV_BIT_DEPTH = 0x6264
+_MKV_CLUSTER = 0x1F43B675
+
+# Matroska TrackType -> ffprobe codec_type (other types make ffprobe skip or remap streams)
+_MKV_TRACK_TYPES = {1: 'video', 2: 'audio', 17: 'subtitle'}
+
+# Matroska CodecID -> ffprobe codec_name, for the common codecs (others are left to ffprobe)
+_MKV_CODECS = {
+    'A_AC3': 'ac3', 'A_EAC3': 'eac3', 'A_TRUEHD': 'truehd', 'A_MLP': 'mlp', 'A_FLAC': 'flac',
+    'A_OPUS': 'opus', 'A_VORBIS': 'vorbis', 'A_ALAC': 'alac', 'A_MPEG/L3': 'mp3', 'A_MPEG/L2': 'mp2',
+    'A_MPEG/L1': 'mp1', 'A_TTA1': 'tta', 'A_WAVPACK4': 'wavpack',
+    'V_MPEG4/ISO/AVC': 'h264', 'V_MPEGH/ISO/HEVC': 'hevc', 'V_AV1': 'av1', 'V_VP8': 'vp8', 'V_VP9': 'vp9',
+    'V_MPEG1': 'mpeg1video', 'V_MPEG2': 'mpeg2video', 'V_MPEG4/ISO/ASP': 'mpeg4', 'V_MPEG4/ISO/SP': 'mpeg4',
+    'V_MPEG4/ISO/AP': 'mpeg4', 'V_THEORA': 'theora', 'V_MJPEG': 'mjpeg', 'V_FFV1': 'ffv1',
+    'S_TEXT/UTF8': 'subrip', 'S_TEXT/ASS': 'ass', 'S_TEXT/SSA': 'ass', 'S_ASS': 'ass', 'S_SSA': 'ass',
+    'S_TEXT/WEBVTT': 'webvtt', 'S_HDMV/PGS': 'hdmv_pgs_subtitle', 'S_HDMV/TEXTST': 'hdmv_text_subtitle',
+    'S_VOBSUB': 'dvd_subtitle', 'S_DVBSUB': 'dvb_subtitle'
+}
+# CodecIDs with profile suffixes (A_AAC/MPEG4/LC, A_DTS/EXPRESS, ...)
+_MKV_CODEC_PREFIXES = [('A_AAC', 'aac'), ('A_DTS', 'dts')]
+# PCM CodecID -> ffprobe codec_name by BitDepth
+_MKV_PCM_CODECS = {
+    'A_PCM/INT/LIT': {8: 'pcm_u8', 16: 'pcm_s16le', 24: 'pcm_s24le', 32: 'pcm_s32le'},
+    'A_PCM/INT/BIG': {8: 'pcm_s8', 16: 'pcm_s16be', 24: 'pcm_s24be', 32: 'pcm_s32be'},
+    'A_PCM/FLOAT/IEEE': {32: 'pcm_f32le', 64: 'pcm_f64le'}
+}
+
+class _EbmlError(Exception):
+    pass
+
+def _ebml_vint(data, pos, keep_marker):
+    """
+    Reads an EBML variable-length integer at 'pos'.
+
+    Returns:
+      tuple: (value, position after the integer); value is None for an "unknown" size.
+    """
+    if pos >= len(data):
+        raise _EbmlError("Unexpected end of file")
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8 or pos + length > len(data):
+        raise _EbmlError("Invalid EBML integer")
+
+    value = first if keep_marker else first & (mask - 1)
+    all_ones = (first & (mask - 1)) == mask - 1
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    if not keep_marker and all_ones:
+        return None, pos + length
+    return value, pos + length
+
+def _ebml_elements(data, start, end):
+    """
+    Iterates the elements between 'start' and 'end'.
+
+    Yields:
+      tuple: (element id, data start, data size or None if unknown)
+    """
+    pos = start
+    while pos < end:
+        element_id, pos = _ebml_vint(data, pos, keep_marker=True)
+        size, pos = _ebml_vint(data, pos, keep_marker=False)
+        yield element_id, pos, size
+        if size is None:
+            return
+        pos += size
+
+def _ebml_uint(data, start, size):
+    return int.from_bytes(data[start:start + size], 'big')
+
+def _matroska_codec_name(codec_id, bit_depth=None):
+    """
+    Returns the ffprobe codec_name of a Matroska CodecID, None if it is not one of the known codecs.
+    """
+    if codec_id in _MKV_CODECS:
+        return _MKV_CODECS[codec_id]
+    if codec_id in _MKV_PCM_CODECS:
+        return _MKV_PCM_CODECS[codec_id].get(bit_depth)
+    for prefix, codec_name in _MKV_CODEC_PREFIXES:
+        if codec_id.startswith(prefix):
+            return codec_name
+    return None
+
+def read_matroska_info(file_path):
+    """
+    Reads the stream layout of a Matroska/WebM file straight from its EBML header, without ffprobe.
+
+    The file is memory-mapped and only the EBML header, the SeekHead, the Segment Info and the
+    Tracks elements are read (a few KB even for huge remuxes). Streams carry the fields the
+    analysis uses, with the values ffprobe would report: one stream per track in file order,
+    codec_name mapped from the CodecID, language defaulting to 'eng' when the element is missing
+    and omitted when 'und'. The header has no bitrate, so 'bit_rate' is never set.
+
+    Arguments:
+      file_path (Path): file to read.
+
     Returns:
-      list[Path]: files found.
+      dict: 'streams'/'format' structure like get_media_info; None if the file uses anything this
+            reader does not model (ffprobe has to be used instead).
     """
-    # I define extensions by mode
-    if dry_run:
-        # In dry-run I search for all video formats supported by ffmpeg
-        extensions = ['*.mkv', '*.mp4', '*.avi', '*.mov', '*.m4v', '*.flv', '*.wmv', '*.webm']
+    try:
+        with open(file_path, 'rb') as media_file, \
+                mmap.mmap(media_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            elements = _ebml_elements(data, 0, len(data))
+            element_id, header_start, header_size = next(elements)
+            if element_id != _EBML_HEADER or header_size is None:
+                return None
+            doc_type = None
+            for child_id, child_start, child_size in _ebml_elements(data, header_start, header_start + header_size):
+                if child_id == _EBML_DOCTYPE:
+                    doc_type = bytes(data[child_start:child_start + child_size]).rstrip(b'\0').decode('ascii', 'replace')
+            if doc_type not in ('matroska', 'webm'):
+                return None
+
+            element_id, segment_start, segment_size = next(elements)
+            if element_id != _MKV_SEGMENT:
+                return None
+            segment_end = len(data) if segment_size is None else min(len(data), segment_start + segment_size)
+
+            # Top level elements of the Segment, up to the first Cluster; the SeekHead points to
+            # Info/Tracks when they are written after the media data
+            found = {}
+            seek_positions = {}
+            for child_id, child_start, child_size in _ebml_elements(data, segment_start, segment_end):
+                if child_id == _MKV_CLUSTER or child_size is None:
+                    break
+                if child_id in (_MKV_INFO, _MKV_TRACKS) and child_id not in found:
+                    found[child_id] = (child_start, child_size)
+                elif child_id == _MKV_SEEKHEAD:
+                    for seek_id, seek_start, seek_size in _ebml_elements(data, child_start, child_start + child_size):
+                        if seek_id != _MKV_SEEK:
+                            continue
+                        target_id = target_pos = None
+                        for entry_id, entry_start, entry_size in _ebml_elements(data, seek_start, seek_start + seek_size):
+                            if entry_id == _MKV_SEEK_ID:
+                                target_id = _ebml_uint(data, entry_start, entry_size)
+                            elif entry_id == _MKV_SEEK_POSITION:
+                                target_pos = _ebml_uint(data, entry_start, entry_size)
+                        if target_id is not None and target_pos is not None:
+                            seek_positions.setdefault(target_id, segment_start + target_pos)
+                if _MKV_INFO in found and _MKV_TRACKS in found:
+                    break
+
+            for target_id in (_MKV_INFO, _MKV_TRACKS):
+                if target_id not in found and target_id in seek_positions:
+                    element_id, child_start, child_size = next(_ebml_elements(data, seek_positions[target_id], segment_end))
+                    if element_id == target_id and child_size is not None:
+                        found[target_id] = (child_start, child_size)
+            if _MKV_INFO not in found or _MKV_TRACKS not in found:
+                return None
+
+            info_start, info_size = found[_MKV_INFO]
+            timecode_scale = 1000000
+            duration = None
+            for child_id, child_start, child_size in _ebml_elements(data, info_start, info_start + info_size):
+                if child_id == _MKV_TIMECODE_SCALE:
+                    timecode_scale = _ebml_uint(data, child_start, child_size)
+                elif child_id == _MKV_DURATION and child_size in (4, 8):
+                    duration = struct.unpack('>f' if child_size == 4 else '>d', data[child_start:child_start + child_size])[0]
+            if not duration:
+                return None
+
+            tracks_start, tracks_size = found[_MKV_TRACKS]
+            streams = []
+            for entry_id, entry_start, entry_size in _ebml_elements(data, tracks_start, tracks_start + tracks_size):
+                if entry_id != _MKV_TRACK_ENTRY:
+                    continue
+                track_type = codec_id = bit_depth = None
+                channels = 1  # Matroska default
+                language = 'eng'  # Matroska default
+                for child_id, child_start, child_size in _ebml_elements(data, entry_start, entry_start + entry_size):
+                    if child_id == _MKV_TRACK_TYPE:
+                        track_type = _ebml_uint(data, child_start, child_size)
+                    elif child_id == _MKV_CODEC_ID:
+                        codec_id = bytes(data[child_start:child_start + child_size]).rstrip(b'\0').decode('ascii', 'replace')
+                    elif child_id == _MKV_LANGUAGE:
+                        language = bytes(data[child_start:child_start + child_size]).rstrip(b'\0').decode('ascii', 'replace')
+                    elif child_id == _MKV_AUDIO:
+                        for audio_id, audio_start, audio_size in _ebml_elements(data, child_start, child_start + child_size):
+                            if audio_id == _MKV_BIT_DEPTH:
+                                bit_depth = _ebml_uint(data, audio_start, audio_size)
+                            elif audio_id == _MKV_CHANNELS:
+                                channels = _ebml_uint(data, audio_start, audio_size)
+                if track_type not in _MKV_TRACK_TYPES or not codec_id:
+                    return None
+                codec_name = _matroska_codec_name(codec_id, bit_depth)
+                if codec_name is None:
+                    return None
+
+                stream = {
+                    'index': len(streams),
+                    'codec_type': _MKV_TRACK_TYPES[track_type],
+                    'codec_name': codec_name
+                }
+                if track_type == 2:
+                    stream['channels'] = channels
+                if language and language != 'und':
+                    stream['tags'] = {'language': language}
+                streams.append(stream)
+
+            return {
+                'streams': streams,
+                'format': {'duration': f"{duration * timecode_scale / 1e9:.6f}"}
+            }
+
+    except (OSError, ValueError, StopIteration, _EbmlError, struct.error):
+        return None
+
+def probe_media_info(file_path, native_probe=False):
+    """
+    Lightweight ffprobe: only the entries needed to decide whether a file has work to do
+    (audio streams and their language tags) plus duration, codec and bitrate used by the analysis.
+
+    Arguments:
+      file_path (Path): file to probe.
+      native_probe (bool): if True, Matroska files are read with read_matroska_info first.
+
+    Returns:
+      dict: 'streams'/'format' structure (same shape as a full ffprobe); None on error.
+    """
+    if native_probe and Path(file_path).suffix.lower() in MATROSKA_EXTENSIONS:
+        media_info = read_matroska_info(file_path)
+        if media_info is not None:
+            return media_info
+
+    cmd = [
+        'ffprobe',
+        '-v', 'quiet',
+        '-print_format', 'json',
+        '-show_entries', 'stream=index,codec_type,codec_name,channels,bit_rate:stream_tags=language:format=duration',
+        str(file_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or not result.stdout:
+        return None
+    media_info = json.loads(result.stdout)
+    if 'duration' not in media_info.get('format', {}):
+        return None
+    media_info.setdefault('streams', [])
+    return media_info
+
+def count_untagged_audio(media_info):
+    """
+    Returns (number of audio streams, number of audio streams without a language tag).
+    """
+    audio_streams = [s for s in media_info['streams'] if s.get('codec_type') == 'audio']
+    untagged = 0
+    for stream in audio_streams:
+        tags = stream.get('tags', {})
+        if not (tags.get('LANGUAGE') or tags.get('language')):
+            untagged += 1
+    return len(audio_streams), untagged
+
+def select_audio_tracks(audio_streams, check_all_tracks=False):
+    """
+    Returns the audio tracks to analyze: the ones without a language tag, or all with check_all_tracks.
+    See AudioMediaChecker.get_tracks_to_analyze.
+    """
+    tracks = []
+    relative_index = 0
+    for stream in audio_streams:
+        tags = stream.get('tags', {})
+        current_lang = tags.get('LANGUAGE', None) or tags.get('language', None)
+        if check_all_tracks or not current_lang:
+            tracks.append({
+                'stream': stream,
+                'relative_index': relative_index,   # To use in ffmpeg: 0:a:{relative_index}
+                'ffprobe_index': stream.get('index')  # Use with mkvpropedit to identify the exact track
+            })
+        relative_index += 1
+    return tracks
+
+def prescan_files(files, threads, check_all_tracks=False, cache_settings=None, on_skip=None, native_probe=False):
+    """
+    Pre-scan stage of folder runs: collects the stream metadata of many files in parallel with
+    lightweight ffprobe calls, and drops the files with nothing to do before any checker (and
+    model or RAM validation) is created.
+
+    Arguments:
+      files (iterable): files to scan (consumed lazily).
+      threads (int): concurrent ffprobe processes.
+      check_all_tracks (bool): if True, every file with audio is kept.
+      cache_settings (tuple): (path, max entries) of the detection cache, used for unchanged files.
+      on_skip (callable): called with (file_path, media_info) for every dropped file.
+      native_probe (bool): read Matroska headers natively instead of running ffprobe.
+
+    Yields:
+      tuple: (file_path, media_info, probe_seconds) of the files to analyze, in input order;
+             media_info is None when the pre-scan failed (the checker probes the file itself).
+    """
+    cache = _open_cache(cache_settings)
+
+    def read_media_info(file_path):
+        identity = None
+        if cache is not None:
+            try:
+                identity = file_identity(file_path)
+            except OSError:
+                return None
+            media_info = cache.get_media_info(file_path, identity)
+            if media_info is not None:
+                return media_info
+        media_info = probe_media_info(file_path, native_probe)
+        if cache is not None and media_info is not None:
+            cache.put_media_info(file_path, identity, media_info)
+        return media_info
+
+    def probe(file_path):
+        start = time.perf_counter()
+        media_info = read_media_info(file_path)
+        return media_info, time.perf_counter() - start
+
+    def outcome(file_path, media_info):
+        if media_info is None:
+            return True
+        audio_tracks, untagged = count_untagged_audio(media_info)
+        if audio_tracks and (untagged or check_all_tracks):
+            return True
+        if on_skip is not None:
+            on_skip(file_path, media_info)
+        return False
+
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='probe')
+    in_flight = collections.deque()
+    try:
+        for file_path in files:
+            if _stop_requested.is_set():
+                break
+            in_flight.append((file_path, executor.submit(probe, file_path)))
+            if len(in_flight) >= threads * 4:
+                file_path, future = in_flight.popleft()
+                media_info, probe_seconds = future.result()
+                if outcome(file_path, media_info):
+                    yield file_path, media_info, probe_seconds
+        while in_flight:
+            file_path, future = in_flight.popleft()
+            media_info, probe_seconds = future.result()
+            if outcome(file_path, media_info):
+                yield file_path, media_info, probe_seconds
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if cache is not None:
+            cache.close()
+
+# Relative decoding cost of the audio codecs (1 = aac/ac3/eac3/opus and the like)
+CODEC_DECODE_COST = {'truehd': 2.5, 'mlp': 2.5, 'dts': 1.5, 'flac': 1.3, 'alac': 1.3}
+
+def expected_cost(file_path, media_info, check_all_tracks=False, activity_map=False):
+    """
+    Estimates the relative cost of analyzing a file from its pre-scan metadata: every track to
+    analyze costs a few sample windows, weighted by how expensive its codec is to decode; long files
+    seek further and, with the activity map, are decoded in full once.
+    Without metadata the file size stands in for the duration (about 1 MB per second), with one track.
+
+    Returns:
+      float: expected cost in relative units (1 = one aac track of a short file).
+    """
+    if media_info is None:
+        try:
+            duration = os.path.getsize(file_path) / 1e6
+        except OSError:
+            duration = 0.0
+        tracks = [{'stream': {}}]
     else:
-        # In normal mode I only search for mkv
-        extensions = ['*.mkv']
-    
-    # If max_depth is 0, we perform an unlimited recursive search.
-    if max_depth == 0:
-        files = []
-        for ext in extensions:
-            files.extend(folder_path.rglob(ext))
-        return files
-    
-    # Searching for files in the current directory for all extensions
-    files = []
-    for ext in extensions:
-        files.extend(folder_path.glob(ext))
-    
-    # If we have not reached the maximum level, we explore the subfolders.
-    if current_level < max_depth:
-        for subdir in folder_path.iterdir():
-            if subdir.is_dir():
-                files.extend(find_files(subdir, max_depth, current_level + 1, dry_run))
-    
-    return files
+        audio_streams = [s for s in media_info['streams'] if s.get('codec_type') == 'audio']
+        tracks = select_audio_tracks(audio_streams, check_all_tracks)
+        try:
+            duration = float(media_info['format']['duration'])
+        except (KeyError, TypeError, ValueError):
+            duration = 0.0
+
+    hours = duration / 3600
+    cost = 0.0
+    for track in tracks:
+        weight = CODEC_DECODE_COST.get(track['stream'].get('codec_name', ''), 1.0)
+        cost += weight * (1 + 0.2 * hours + (hours if activity_map else 0.0))
+    return cost
+
+def schedule_files(items, policy, check_all_tracks=False, activity_map=False):
+    """
+    Orders the files of a run by expected cost (see expected_cost). Consumes the whole input.
+
+    Arguments:
+      items (iterable): (file_path, media_info, probe_seconds) tuples.
+      policy (str): 'sjf' (shortest expected job first: most files done early) or 'balanced'
+                    (longest first, so the pool workers take the next job when free and
+                    finish together: longest processing time first bin-packing).
+
+    Returns:
+      list: the (file_path, media_info, probe_seconds) tuples in processing order.
+    """
+    costed = [(expected_cost(item[0], item[1], check_all_tracks, activity_map), index, item)
+              for index, item in enumerate(items)]
+    costed.sort(key=lambda entry: (entry[0] if policy == 'sjf' else -entry[0], entry[1]))
+    return [item for _, _, item in costed]
+
+def within_time_budget(items, deadline, scan_stats):
+    """
+    Yields the items until 'deadline' (time.monotonic()) passes: files already started are completed,
+    the others are left for the next run (with --since-last-run they are the only ones processed).
+    Sets scan_stats['budget_reached'], and scan_stats['deferred'] when the remaining files are known.
+    """
+    for position, item in enumerate(items):
+        if time.monotonic() >= deadline:
+            scan_stats['budget_reached'] = True
+            if isinstance(items, list):
+                scan_stats['deferred'] = len(items) - position
+            return
+        yield item
+
+class SequentialLanguageTest:
+    """
+    Language statistics of one audio track, updated after every sample, with a sequential
+    stopping rule on the weighted average of the leading language.
+
+    The weighted average of a language is the sum of its confidences divided by the number of
+    samples, i.e. the mean of a per-sample score in [0, 1]. After each sample a normal confidence
+    bound is placed around the leader's mean (the sample variance is floored with a prior, so two
+    near-identical samples do not look infinitely certain): the test accepts as soon as the lower
+    bound clears the threshold and rejects as soon as the upper bound cannot reach it.
+    """
+    ACCEPT = 'accept'
+    REJECT = 'reject'
+
+    def __init__(self, confidence_threshold, min_samples=2, min_reject_samples=4, max_samples=40,
+                 z_score=1.645, prior_std=0.1, min_position=5, max_position=95, position_scores=None,
+                 min_gap=5):
+        """
+        Arguments:
+          confidence_threshold (int): confidence threshold (percentage).
+          min_samples (int): samples required before accepting.
+          min_reject_samples (int): samples required before giving up.
+          max_samples (int): maximum number of samples per track, failed extractions included.
+          z_score (float): width of the confidence bound (1.645 = one-sided 95%).
+          prior_std (float): minimum standard deviation assumed for the per-sample score.
+          min_position, max_position (int): range of the sample positions (percentage of the file).
+          position_scores (dict): speech density (0-1) of the window starting at each position;
+                                  if given, the most speech-dense windows are sampled first.
+          min_gap (int): minimum distance between ranked positions (percentage), when possible.
+        """
+        self.threshold = confidence_threshold / 100
+        self.min_samples = min_samples
+        self.min_reject_samples = min_reject_samples
+        self.max_samples = max_samples
+        self.z_score = z_score
+        self.prior_std = prior_std
+        self.min_position = min_position
+        self.max_position = max_position
+        self.position_scores = position_scores
+        self.min_gap = min_gap
+
+        self.detections = []        # (language, confidence) of every analyzed sample
+        self.used_positions = []    # every position handed out, analyzed or not
+        self.outstanding = 0        # positions handed out whose sample is not analyzed (or discarded) yet
+        self.failed = 0             # positions whose sample could not be extracted
+
+    @property
+    def samples(self):
+        return len(self.detections)
+
+    def add(self, language, confidence):
+        """
+        Adds the result of one sample.
+        """
+        self.detections.append((language, confidence))
+        self.outstanding = max(0, self.outstanding - 1)
+
+    def discard(self):
+        """
+        Gives up one position handed out whose sample could not be analyzed (failed extraction).
+        It still counts toward max_samples, so a track that cannot be extracted is given up.
+        """
+        self.outstanding = max(0, self.outstanding - 1)
+        self.failed += 1
+
+    def next_positions(self, count):
+        """
+        Returns the next 'count' sample positions.
+
+        Without position scores, each position is as far as possible from the positions already
+        used and from the start/end of the file (intro and credits), so the samples spread evenly
+        over the track: 50%, 25%, 75%, 12%, 37%, ...
+        With position scores, the most speech-dense window is taken first, among the positions at
+        least 'min_gap' away from the used ones; ties are broken by coverage.
+        """
+        positions = []
+        for _ in range(count):
+            # Positions still in flight (e.g. a round extracted in advance) are counted, so the
+            # track never gets more than max_samples samples
+            remaining = self.max_samples - self.samples - self.failed - self.outstanding
+            if remaining <= 0:
+                break
+            taken = self.used_positions + [0, 100]
+            candidates = [p for p in range(self.min_position, self.max_position + 1) if p not in self.used_positions]
+            if not candidates:
+                break
+
+            def coverage(p):
+                return min(abs(p - u) for u in taken)
+
+            if self.position_scores:
+                spaced = [p for p in candidates if all(abs(p - u) >= self.min_gap for u in self.used_positions)]
+                best = max(spaced or candidates,
+                           key=lambda p: (round(self.position_scores.get(p, 0), 2), coverage(p), -p))
+            else:
+                best = max(candidates, key=lambda p: (coverage(p), -p))
+
+            self.used_positions.append(best)
+            positions.append(best)
+        self.outstanding += len(positions)
+        return positions
+
+    def weighted_averages(self):
+        """
+        Returns the weighted average (percentage) of the confidences of each detected language.
+        """
+        totals = {}
+        for language, confidence in self.detections:
+            totals[language] = totals.get(language, 0) + confidence
+        return {language: total / self.samples * 100 for language, total in totals.items()}
+
+    def leader(self):
+        """
+        Returns (language, weighted average percentage) of the leading language, (None, 0) without samples.
+        """
+        averages = self.weighted_averages()
+        if not averages:
+            return None, 0
+        language = max(averages, key=averages.get)
+        return language, averages[language]
+
+    def decision(self):
+        """
+        Returns ACCEPT, REJECT, or None while more samples are needed.
+        """
+        # Positions handed out but not analyzed yet do not count: their samples are still to come
+        all_used = len(self.used_positions) > self.max_position - self.min_position
+        exhausted = self.samples + self.failed >= self.max_samples or (not self.outstanding and all_used)
+        if not self.detections:
+            return self.REJECT if exhausted else None
+
+        language, _ = self.leader()
+        scores = [confidence if detected == language else 0.0 for detected, confidence in self.detections]
+        n = len(scores)
+        mean = sum(scores) / n
+        variance = sum((score - mean) ** 2 for score in scores) / (n - 1) if n > 1 else 0.0
+        margin = self.z_score * ((variance + self.prior_std ** 2) / n) ** 0.5
+
+        if n >= self.min_samples and mean - margin >= self.threshold:
+            return self.ACCEPT
+        if n >= self.min_reject_samples and mean + margin < self.threshold:
+            return self.REJECT
+        if exhausted:
+            return self.ACCEPT if mean >= self.threshold else self.REJECT
+        return None
+
+class WindowPolicy:
+    """
+    Shape of the audio windows handed to Whisper.
+
+    Language identification looks at exactly one encoder context (30 s of 16 kHz audio for every
+    Whisper model): audio past it is decoded for nothing, a shorter window is padded with silence.
+    Every window is therefore one context long. With a speech activity map, the window is filled
+    with the speech spans found from its start on (trimmed to fit, or several concatenated), so the
+    pauses and music beds between the lines do not take the place of speech.
+    """
+
+    def __init__(self, context_seconds=30, sample_rate=16000, speech_threshold=0.3, max_reach=3,
+                 min_span=2, max_spans=6):
+        """
+        Arguments:
+          context_seconds (int): length of one Whisper context in seconds.
+          sample_rate (int): sample rate expected by Whisper.
+          speech_threshold (float): minimum activity score (0-1) of a speech second.
+          max_reach (int): how far speech is looked for after the start, in contexts.
+          min_span (int): shortest speech span worth an ffmpeg input, in seconds.
+          max_spans (int): maximum number of spans concatenated into one window.
+        """
+        self.context_seconds = context_seconds
+        self.sample_rate = sample_rate
+        self.speech_threshold = speech_threshold
+        self.max_reach = max_reach
+        self.min_span = min_span
+        self.max_spans = max_spans
+
+    @property
+    def context_samples(self):
+        return int(self.context_seconds * self.sample_rate)
+
+    def spans(self, start_seconds, total_duration, activity=None):
+        """
+        Returns the spans of the window starting at 'start_seconds'.
+
+        Arguments:
+          start_seconds (float): start of the window.
+          total_duration (float): duration of the file in seconds.
+          activity (numpy.ndarray): per-second speech activity scores of the track (optional).
+
+        Returns:
+          list: (start seconds, duration seconds) spans, one context long in total. Without an
+                activity map, or without enough speech within reach, one contiguous span.
+        """
+        context = self.context_seconds
+        start = max(0.0, min(start_seconds, total_duration - context))
+        plain = [(start, context)]
+        if activity is None:
+            return plain
+
+        speech = activity >= self.speech_threshold
+        second = int(start)
+        last = min(len(activity), int(start + context * self.max_reach))
+        spans = []
+        filled = 0
+        while second < last and filled < context and len(spans) < self.max_spans:
+            if not speech[second]:
+                second += 1
+                continue
+            # A one-second pause does not break a span
+            end = second + 1
+            while end < last and (speech[end] or (end + 1 < last and speech[end + 1])):
+                end += 1
+            if end - second >= self.min_span:
+                length = min(end - second, context - filled)
+                spans.append((float(second), float(length)))
+                filled += length
+            second = end
+
+        return spans if filled >= context else plain
+
+def file_identity(file_path):
+    """
+    Returns the identity of a file as (inode, size, mtime in ns): it changes whenever the file is modified.
+    """
+    stat = os.stat(file_path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+class DetectionCache:
+    """
+    On-disk (SQLite) cache of ffprobe results and language detections.
+
+    Media information is keyed by the file identity (inode, size, mtime); detections by the file
+    identity plus stream index and Whisper model (the identity already pins the stream content,
+    codec and bitrate are left out as the native Matroska reader does not report the bitrate). When a file changes its old
+    entries are dropped, and in every table the least recently used entries are evicted above
+    'max_entries' (entries of deleted files are never used again, so they go first).
+    Verdicts are also indexed by audio fingerprint (--dedup), so identical audio streams of
+    other files reuse them.
+    """
+    # Inserts into a table between two checks of its size
+    TRIM_INTERVAL = 256
+
+    def __init__(self, path, max_entries=100000):
+        """
+        Arguments:
+          path (str): SQLite database path (created if missing).
+          max_entries (int): maximum number of entries kept in each table.
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._inserts = collections.Counter()
+
+        # WAL + busy timeout: several --workers processes share the same database
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS media_info ("
+                " path TEXT PRIMARY KEY, file_key TEXT NOT NULL, info TEXT NOT NULL,"
+                " last_access REAL NOT NULL DEFAULT 0)"
+            )
+            # Databases created before media_info had its own eviction
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(media_info)")]
+            if 'last_access' not in columns:
+                self._db.execute("ALTER TABLE media_info ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS detections ("
+                " key TEXT PRIMARY KEY, path TEXT NOT NULL, file_key TEXT NOT NULL,"
+                " language TEXT, confidence REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                " fingerprint TEXT NOT NULL, model TEXT NOT NULL, language TEXT, confidence REAL NOT NULL,"
+                " last_access REAL NOT NULL, PRIMARY KEY (fingerprint, model))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS detections_path ON detections (path)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS detections_last_access ON detections (last_access)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS media_info_last_access ON media_info (last_access)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS fingerprints_last_access ON fingerprints (last_access)")
+
+    def _inserted(self, table):
+        """
+        Counts an insert into 'table' and evicts its least recently used rows above max_entries,
+        checking the size only every TRIM_INTERVAL inserts. Called with the lock held, in a transaction.
+        """
+        self._inserts[table] += 1
+        if self._inserts[table] >= self.TRIM_INTERVAL:
+            self._trim(table)
+
+    def _trim(self, table):
+        self._inserts[table] = 0
+        excess = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                f"DELETE FROM {table} WHERE rowid IN ("
+                f" SELECT rowid FROM {table} ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+
+    @staticmethod
+    def _file_key(identity):
+        return ':'.join(str(value) for value in identity)
+
+    @staticmethod
+    def _detection_key(identity, stream, model):
+        return ':'.join(str(value) for value in (*identity, stream.get('index'), model))
+
+    def get_media_info(self, file_path, identity):
+        """
+        Returns the cached ffprobe information of the file, None if missing or stale.
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT file_key, info FROM media_info WHERE path = ?", (str(file_path),)
+            ).fetchone()
+            if row is None or row[0] != self._file_key(identity):
+                return None
+            self._db.execute("UPDATE media_info SET last_access = ? WHERE path = ?", (time.time(), str(file_path)))
+        return json.loads(row[1])
+
+    def put_media_info(self, file_path, identity, media_info):
+        """
+        Stores the ffprobe information of the file, replacing the one of a previous version.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO media_info (path, file_key, info, last_access) VALUES (?, ?, ?, ?)",
+                (str(file_path), self._file_key(identity), json.dumps(media_info), time.time())
+            )
+            self._inserted('media_info')
+
+    def get_detection(self, file_path, identity, stream, model):
+        """
+        Returns the cached (language, confidence) of the stream, None if missing.
+        """
+        key = self._detection_key(identity, stream, model)
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT language, confidence FROM detections WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE detections SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def put_detection(self, file_path, identity, stream, model, language, confidence):
+        """
+        Stores the detection of a stream. Entries of older versions of the file are invalidated.
+        """
+        file_key = self._file_key(identity)
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM detections WHERE path = ? AND file_key != ?", (str(file_path), file_key)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO detections (key, path, file_key, language, confidence, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._detection_key(identity, stream, model), str(file_path), file_key,
+                 language, confidence, time.time())
+            )
+            self._inserted('detections')
+
+    def get_fingerprint(self, fingerprint, model):
+        """
+        Returns the (language, confidence) stored for an audio fingerprint, None if missing.
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT language, confidence FROM fingerprints WHERE fingerprint = ? AND model = ?",
+                (fingerprint, model)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE fingerprints SET last_access = ? WHERE fingerprint = ? AND model = ?",
+                                 (time.time(), fingerprint, model))
+        return row
+
+    def put_fingerprint(self, fingerprint, model, language, confidence):
+        """
+        Stores the verdict of an audio fingerprint.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints (fingerprint, model, language, confidence, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, model, language, confidence, time.time())
+            )
+            self._inserted('fingerprints')
+
+    def close(self):
+        """
+        Applies the size limit to the tables written since their last check, then closes the database.
+        """
+        with self._lock:
+            with self._db:
+                for table, inserts in self._inserts.items():
+                    if inserts:
+                        self._trim(table)
+            self._db.close()
+
+def audio_fingerprint(samples, total_duration, sample_rate=16000, chunk_seconds=0.1, step_db=3, min_active=0.5):
+    """
+    Returns a fingerprint of the audio of a track from its first sample windows.
+
+    The windows are cut into 100 ms chunks whose energy is quantized to 3 dB steps: cheap to
+    compute on the PCM already extracted, and equal for the same audio stream in another file
+    (re-mux, multi-episode pack) because the sample positions are the same. The file duration
+    is part of the fingerprint, so windows taken at different times never match.
+
+    Arguments:
+      samples (list): numpy.ndarray waveforms of the track (the first round).
+      total_duration (float): duration of the file in seconds.
+
+    Returns:
+      str: hex digest; None if a window is missing or the audio is mostly silence (too generic to match).
+    """
+    import numpy as np
+
+    if not samples or any(sample is None for sample in samples):
+        return None
+
+    chunk = int(sample_rate * chunk_seconds)
+    digest = hashlib.sha1(f'{total_duration:.0f}'.encode())
+    active = 0
+    chunks = 0
+    for sample in samples:
+        audio = sample[:len(sample) - len(sample) % chunk].astype(np.float32)
+        if sample.dtype == np.int16:
+            audio /= 32768.0
+        energy_db = 10 * np.log10(np.mean(audio.reshape(-1, chunk) ** 2, axis=1) + 1e-10)
+        levels = np.clip(np.round(energy_db / step_db), -30, 0).astype(np.int8)
+        active += int(np.count_nonzero(energy_db > -60))
+        chunks += len(levels)
+        digest.update(levels.tobytes())
+
+    if not chunks or active / chunks < min_active:
+        return None
+    return digest.hexdigest()
+
+class ScanJournal:
+    """
+    Journal of the files processed by previous --since-last-run scans.
+
+    For every path it stores the size and mtime the file had after processing (so the tags written
+    by the run itself do not make it look modified), whether all its audio tracks have a language
+    tag, whether it was a dry run and the options of the run. Unchanged files are skipped without
+    any ffprobe call when they are fully tagged, or when they were processed with the same options
+    (a tag left unset may be set by another model, threshold or --force-language).
+    """
+    def __init__(self, path, options=None):
+        """
+        Arguments:
+          path (str): JSON journal path (created on first save).
+          options (dict): options of the current run that affect the outcome of a file
+                          (check_all_tracks, model, confidence, force_language).
+        """
+        self.path = Path(path)
+        self.options = options or {}
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as journal_file:
+                self.entries = json.load(journal_file).get('files', {})
+
+    def is_unchanged(self, file_path, dry_run):
+        """
+        Returns True if the file was processed by a previous run, has not changed since and there is
+        nothing new to do: all its audio tracks are tagged (and --check-all-tracks is not used), or the
+        previous run had the same options. Files seen only by a dry run are processed again by a normal run.
+        """
+        entry = self.entries.get(str(file_path))
+        if entry is None or (entry.get('dry_run') and not dry_run):
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            return False
+        if entry['all_tagged'] and not self.options.get('check_all_tracks'):
+            return True
+        return entry.get('options') == self.options
+
+    def record(self, file_path, untagged_tracks, dry_run):
+        """
+        Records a processed file with its current size and mtime.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        self.entries[str(file_path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'all_tagged': untagged_tracks == 0,
+            'dry_run': dry_run,
+            'options': self.options
+        }
+
+    def save(self):
+        """
+        Writes the journal atomically (temporary file + rename).
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as journal_file:
+            json.dump({'saved_at': datetime.datetime.now().isoformat(), 'files': self.entries}, journal_file)
+        os.replace(tmp_path, self.path)
+
+class RunCheckpoint:
+    """
+    Append-only JSONL checkpoint of a run, for --resume.
+
+    Every track verdict and every file outcome is appended as one line as soon as it is known, and
+    flushed to disk (fsync) before going on, so a run killed at any point (Ctrl-C, OOM, container
+    restart) loses at most the track being analyzed. Track lines carry the identity the file had
+    before its tags were updated, file lines the identity after: a resumed run skips the completed
+    files and answers the concluded tracks of the others, as long as the files were not modified since.
+    Several processes (--workers) can append to the same checkpoint.
+    """
+    def __init__(self, path, resume=False):
+        """
+        Arguments:
+          path (str): JSONL checkpoint path (created if missing).
+          resume (bool): load the records of the interrupted run; if False the checkpoint starts empty.
+        """
+        self.path = Path(path)
+        self.files = {}
+        self.tracks = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists():
+            self._load()
+        elif not resume:
+            self.path.write_bytes(b'')
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # A line cut by a crash is terminated, so that the next record starts on its own line
+        if os.fstat(self._fd).st_size:
+            with open(self.path, 'rb') as checkpoint_file:
+                checkpoint_file.seek(-1, os.SEEK_END)
+                if checkpoint_file.read(1) != b'\n':
+                    os.write(self._fd, b'\n')
+
+    def _load(self):
+        """
+        Reads the records of the checkpoint; the last record of each file/track wins.
+        Lines that cannot be decoded (cut by a crash while being written) are ignored.
+        """
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as checkpoint_file:
+            for line in checkpoint_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('type') == 'file':
+                    self.files[record['file']] = record
+                elif record.get('type') == 'track':
+                    self.tracks.setdefault(record['file'], {})[record['track']] = record
+
+    def _append(self, record):
+        """
+        Appends one record with a single write and waits for it to reach the disk.
+        """
+        line = (json.dumps(record) + '\n').encode('utf-8')
+        with self._lock:
+            os.write(self._fd, line)
+            os.fsync(self._fd)
+
+    def is_done(self, file_path, dry_run, model_size):
+        """
+        Returns True if the file was completed by the checkpointed run with the same model and has not
+        changed since. Files completed only by a dry run are processed again by a normal run.
+        """
+        record = self.files.get(str(file_path))
+        if record is None or not record['success'] or (record['dry_run'] and not dry_run):
+            return False
+        if record.get('model') != model_size:
+            return False
+        try:
+            return record['identity'] == list(file_identity(file_path))
+        except OSError:
+            return False
+
+    def track_verdicts(self, file_path, model_size):
+        """
+        Returns the tracks of the file concluded by the checkpointed run with the same model on the
+        current version of the file, as {ffprobe index: (language, confidence)}.
+        """
+        records = self.tracks.get(str(file_path))
+        if not records:
+            return {}
+        identity = list(file_identity(file_path))
+        return {
+            index: (record['language'], record['confidence'])
+            for index, record in records.items()
+            if record['identity'] == identity and record['model'] == model_size
+        }
+
+    def record_track(self, file_path, ffprobe_index, detected_lang, confidence, model_size):
+        """
+        Records the verdict of a track (confidence 0-1), before any tag of the file is updated.
+        """
+        self._append({
+            'type': 'track',
+            'file': str(file_path),
+            'identity': list(file_identity(file_path)),
+            'track': ffprobe_index,
+            'language': detected_lang,
+            'confidence': confidence,
+            'model': model_size,
+            'at': datetime.datetime.now().isoformat(timespec='seconds')
+        })
+
+    def record_file(self, file_path, success, untagged_tracks, dry_run, model_size):
+        """
+        Records the outcome of a file (analyzed with 'model_size'), with its identity after the tag updates.
+        """
+        try:
+            identity = list(file_identity(file_path))
+        except OSError:
+            identity = None
+        self._append({
+            'type': 'file',
+            'file': str(file_path),
+            'identity': identity,
+            'success': success,
+            'untagged_tracks': untagged_tracks,
+            'dry_run': dry_run,
+            'model': model_size,
+            'at': datetime.datetime.now().isoformat(timespec='seconds')
+        })
+
+    def close(self):
+        os.close(self._fd)
+
+class RunMetrics:
+    """
+    Totals of the per-file metrics of a run (see AudioMediaChecker.summary), written at the end of
+    the run in the Prometheus textfile collector format.
+    """
+    # Metric name -> help text; every value is the total of the run
+    METRICS = {
+        'tracks': 'Audio tracks concluded',
+        'cached_tracks': 'Audio tracks answered by the detection cache',
+        'deduplicated_tracks': 'Audio tracks answered by the verdict of identical audio',
+        'samples': 'Audio samples analyzed by Whisper',
+        'escalated_tracks': 'Audio tracks escalated from the cascade model to the configured one',
+        'escalated_samples': 'Audio samples analyzed by the configured model after a cascade escalation',
+        'extraction_calls': 'ffmpeg sample extraction runs',
+        'pcm_bytes': 'Bytes of PCM audio extracted',
+        'probe_seconds': 'Time spent reading the stream information',
+        'model_load_seconds': 'Time spent loading Whisper models',
+        'inference_seconds': 'Time spent on language detection',
+        'processing_seconds': 'Time spent analyzing files',
+        'header_rewrites': 'MKV header rewrites'
+    }
+
+    def __init__(self):
+        self.files = {'success': 0, 'failure': 0}
+        self.totals = dict.fromkeys(self.METRICS, 0)
+
+    def add(self, summary):
+        """
+        Adds the outcome of a file.
+        """
+        self.files['success' if summary['success'] else 'failure'] += 1
+        self.totals['header_rewrites'] += summary['header_rewrites']
+        for name, value in summary['metrics'].items():
+            if name in self.totals:
+                self.totals[name] += value
+
+    def write_textfile(self, path):
+        """
+        Writes the metrics atomically (temporary file + rename), as the textfile collector requires.
+        """
+        lines = [
+            '# HELP audiomediachecker_last_run_files Files processed in the last run.',
+            '# TYPE audiomediachecker_last_run_files gauge'
+        ]
+        lines += [f'audiomediachecker_last_run_files{{result="{result}"}} {count}' for result, count in self.files.items()]
+        for name, help_text in self.METRICS.items():
+            lines += [
+                f'# HELP audiomediachecker_last_run_{name} {help_text} in the last run.',
+                f'# TYPE audiomediachecker_last_run_{name} gauge',
+                f'audiomediachecker_last_run_{name} {round(self.totals[name], 3)}'
+            ]
+        lines += [
+            '# HELP audiomediachecker_last_run_timestamp_seconds End time of the last run.',
+            '# TYPE audiomediachecker_last_run_timestamp_seconds gauge',
+            f'audiomediachecker_last_run_timestamp_seconds {time.time():.0f}'
+        ]
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+class ExtractionPipeline:
+    """
+    Background extraction threads shared by the checkers of a run.
+
+    ffmpeg extractions are submitted to a thread pool so that they overlap with Whisper inference
+    (the next round of samples, the first round of the next file). Every submitted extraction holds
+    a slot until its result is taken or discarded: with at most 'max_in_flight' slots, the decoded
+    PCM kept in memory stays bounded, and when the pipeline is full the caller extracts inline.
+    """
+    def __init__(self, threads=2, max_in_flight=2):
+        """
+        Arguments:
+          threads (int): extraction threads.
+          max_in_flight (int): maximum extractions submitted and not yet consumed.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='extract')
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def submit(self, fn, *args, block=True):
+        """
+        Submits an extraction. Returns its future, or None if the pipeline is full and block is False.
+        """
+        if not self._slots.acquire(blocking=block):
+            return None
+        try:
+            future = self.executor.submit(fn, *args)
+        except RuntimeError:
+            # Pipeline already shut down
+            self._slots.release()
+            return None
+        # The slot is freed exactly once, by take() or discard()
+        future.slot_held = True
+        return future
+
+    def _release(self, future):
+        if getattr(future, 'slot_held', False):
+            future.slot_held = False
+            self._slots.release()
+
+    def take(self, future):
+        """
+        Waits for an extraction and returns its result, freeing its slot.
+        """
+        try:
+            return future.result()
+        finally:
+            self._release(future)
+
+    def discard(self, future):
+        """
+        Drops an extraction that is not needed anymore; its slot is freed as soon as it stops.
+        """
+        if future.cancel():
+            self._release(future)
+        else:
+            future.add_done_callback(self._release)
+
+    def shutdown(self):
+        """
+        Stops the pipeline: queued extractions are cancelled, running ones are awaited.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
 
 class AudioMediaChecker:
     def __init__(self, file_path, check_all_tracks=False, verbose=False, dry_run=False, 
-                 force_language=None, confidence_threshold=65, model='base', gpu=False, logger=None, json_output=False):
+                 force_language=None, confidence_threshold=65, model='base', gpu=False, logger=None, json_output=False,
+                 batch_size=8, cache=None, pipeline=None, media_info=None, probe_seconds=0.0, native_probe=False,
+                 activity_map=False, cpu_threads=None, metrics=False, dedup=False, compute_type=None,
+                 cascade_model=None, cascade_margin=10, checkpoint=None):
         """
         Initialize the media file controller.
 
@@ -104,6 +1448,24 @@ class AudioMediaChecker:
           model (str): whisper model to be used.
           gpu (bool): if True, use GPU.
           logger (logging.Logger): logger to use.
+          json_output (bool): if True, results are collected for the json output.
+          batch_size (int): maximum number of samples per encoder batch.
+          cache (DetectionCache): persistent cache of media information and detections (optional).
+          pipeline (ExtractionPipeline): background extraction threads (optional).
+          media_info (dict): stream metadata already collected by the pre-scan (skips ffprobe).
+          probe_seconds (float): time the pre-scan took to collect 'media_info'.
+          native_probe (bool): read Matroska headers natively, ffprobe only as fallback.
+          activity_map (bool): rank sample windows by speech activity and fill them with speech only
+                               (one extra read of the audio).
+          cpu_threads (int): inference threads on CPU, None to choose them automatically.
+          metrics (bool): if True, every json result carries the metrics of its track.
+          dedup (bool): reuse the verdict of tracks with the same audio fingerprint (this run or the cache).
+          compute_type (str): CTranslate2 compute type, None to choose it from the device (see plan_resources).
+          cascade_model (str): smaller model that classifies the samples first; 'model' is used only for
+                               the tracks where it is not confident enough (None to disable).
+          cascade_margin (int): percentage points above the threshold the cascade model must reach.
+          checkpoint (RunCheckpoint): checkpoint where the track verdicts are recorded and, when resuming,
+                                      taken from (None to disable).
         """
         self.verbose = verbose
         self.file_path = Path(file_path)
@@ -111,119 +1473,388 @@ class AudioMediaChecker:
         self.dry_run = dry_run
         self.force_language = force_language
         self.confidence_threshold = confidence_threshold
-        self.interrupted = False
         self.whisper_model_size = model
         self.gpu = gpu
         self.logger = logger if logger else _setup_logger(verbose)
         self.json_output = json_output
-
-        # Whisper model cache (lazy-loaded on first use)
-        self._whisper = None
+        self.batch_size = max(1, batch_size)
+        self.cache = cache
+        self.pipeline = pipeline
+        self.native_probe = native_probe
+        self.activity_map = activity_map
+        self.cpu_threads = cpu_threads
+        self.compute_type = compute_type
+        self.cascade_model = cascade_model
+        self.cascade_margin = cascade_margin
+        self.checkpoint = checkpoint
+        self.metrics = metrics
+        self.dedup = dedup
+        # Tracks/tests selected for the analysis, and the next round of samples already reserved
+        # (windows, owners, future of the background extraction or None)
+        self._analysis = None
+        self._queued_round = None
+        # Samples taken per track in each detection round, and their shape (one Whisper context)
+        self.samples_per_round = 2
+        self.window_policy = WindowPolicy()
+
+        # Per-track results collected by process_file (printed by the caller in json mode)
+        self.json_results = []
+        # Language tags queued for the file and tags written: ffprobe index -> language
+        self.pending_tags = {}
+        self.updated_tracks = {}
+        # Number of mkvpropedit runs (header rewrites) on the file
+        self.header_rewrites = 0
+
+        # Whisper models by size (taken from the shared registry on first use)
+        self._whisper = {}
+        # Time spent loading the model (0 if reused) and running inference, in seconds
+        self.model_load_seconds = 0.0
+        self.inference_seconds = 0.0
+        # Stage metrics: stream information read time, time in process_file, ffmpeg extraction runs,
+        # bytes of PCM received, and per-track counters (see _track_metrics)
+        self.probe_seconds = probe_seconds if media_info is not None else 0.0
+        self.processing_seconds = 0.0
+        self.extraction_calls = 0
+        self.pcm_bytes = 0
+        self.track_metrics = {}
 
         # In dry-run mode I accept all video formats, otherwise only mkv
         if not self.dry_run and self.file_path.suffix.lower() != '.mkv':
             raise ValueError(f"Formato file non supportato: {self.file_path}")
 
-        # Get the multimedia information once and save it.
-        self.media_info = self.get_media_info()
+        # Get the multimedia information once and save it (unless the pre-scan already did).
+        if media_info is None:
+            start = time.perf_counter()
+            media_info = self.get_media_info()
+            self.probe_seconds = time.perf_counter() - start
+        self.media_info = media_info
         self.total_duration = float(self.media_info['format']['duration'])
 
         self._validate_model_ram()
 
-    def _lazy_load_whisper(self):
+    @property
+    def interrupted(self):
         """
-        Instantiate and cache the Whisper model on first use.
-        Reuses the same instance for subsequent transcriptions.
+        True once SIGINT/SIGTERM asked the process to stop: the analysis ends at the next round.
         """
-        if self._whisper is None:
-            device = 'cuda' if self.gpu else 'cpu'
-            compute_type = self._best_compute_type()
-            cpu_threads = self._optimal_cpu_threads() if device == 'cpu' else 0
-
-            self.logger.info(f"Loading Whisper model '{self.whisper_model_size}' on {device}...")
-            self.logger.debug(f"Whisper configuration: compute_type={compute_type}, threads={cpu_threads or 'auto'}")
+        return _stop_requested.is_set() or (_forwarded_stop is not None and _forwarded_stop.is_set())
 
-            self._whisper = WhisperModel(
-                self.whisper_model_size,
-                device=device,
-                compute_type=compute_type,
-                cpu_threads=cpu_threads,
-                download_root="/models"  # persist weights if volume-mapped
-            )
-
-            self.logger.info("Whisper model loaded.")
-        return self._whisper
+    def _lazy_load_whisper(self, model_size=None):
+        """
+        Returns the Whisper model ('model_size', by default the configured one), loading it on first use.
+        The model is taken from the process-wide registry, so every checker of the run
+        with the same configuration reuses the same instance.
+        """
+        model_size = model_size or self.whisper_model_size
+        if model_size not in self._whisper:
+            key = self.whisper_key(model_size, self.gpu, self.cpu_threads, self.compute_type)
+            model, load_seconds = load_whisper_model(key, self.logger)
+            self.model_load_seconds += load_seconds
+            self._whisper[model_size] = model
+            # Later windows follow the receptive field of the loaded model
+            self.window_policy.context_seconds = model.feature_extractor.chunk_length
+            self.window_policy.sample_rate = model.feature_extractor.sampling_rate
+        return self._whisper[model_size]
 
     def _validate_model_ram(self):
         """
-        Verify that the available RAM is sufficient for the selected model.
+        Verify that the system RAM is sufficient for the selected model
+        (the available memory is checked by plan_resources, before the run).
         """
-        model_requirements = {
-            'tiny': 2, 'base': 3, 'small': 5, 'medium': 10, 'large': 16, 'large-v3': 16
-        }
-        required_ram = model_requirements.get(self.whisper_model_size, 4)
+        required_ram = MODEL_MEMORY_GB.get(self.whisper_model_size, 1.0) + WORKER_OVERHEAD_GB
 
         if self._system_ram_gb() < required_ram:
-            raise MemoryError(f"Il modello {self.whisper_model_size} richiede almeno {required_ram}GB di RAM")
+            raise MemoryError(f"Il modello {self.whisper_model_size} richiede almeno {required_ram:.1f}GB di RAM")
 
-    def _best_compute_type(self):
+    @classmethod
+    def whisper_key(cls, model_size, gpu=False, cpu_threads=None, compute_type=None):
         """
-        Determines the best type of computation based on the model and available RAM.
+        Returns the registry key (model size, device, compute_type, cpu_threads) of a Whisper configuration.
         """
-        model_size_map = {
-            'tiny': 'int8',
-            'base': 'int8',
-            'small': 'int8',
-            'medium': 'int8' if self._system_ram_gb() >= 16 else 'float32',
-            'large': 'float32',
-            'large-v3': 'float32'
-        }
-        return model_size_map.get(self.whisper_model_size, 'int8')
+        device = 'cuda' if gpu else 'cpu'
+        return (model_size, device, compute_type or cls._best_compute_type(gpu),
+                cls._optimal_cpu_threads(cpu_threads) if device == 'cpu' else 0)
+
+    @staticmethod
+    def _best_compute_type(gpu=False):
+        """
+        Determines the best type of computation for the device: int8 weights on CPU
+        (also for the large models), int8 weights with float16 activations on GPU.
+        """
+        return 'int8_float16' if gpu else 'int8'
 
-    def _optimal_cpu_threads(self):
+    @staticmethod
+    def _optimal_cpu_threads(cpu_threads=None):
         """
-        It calculates the optimal number of CPU threads (maximum 8).
+        It calculates the optimal number of CPU threads (maximum 8), unless set explicitly
+        (main sets them with plan_resources, sharing the cores among the workers).
         """
+        if cpu_threads:
+            return cpu_threads
         available_cores = os.cpu_count() or 4
         return min(available_cores, 8)
 
     @staticmethod
     def _system_ram_gb():
         """
-        Returns the amount of system RAM (in GB).
+        Returns the amount of system RAM (in GB).
+        """
+        try:
+            import psutil
+            return psutil.virtual_memory().total / (1024 ** 3)
+        except Exception:
+            return 4  # Conservative value if RAM cannot be determined.
+
+    def _prepare_analysis(self):
+        """
+        Selects the tracks to analyze, answers the cached ones and creates the sequential test of
+        the others. Computed once, it is shared by prefetch() and process_file().
+
+        Returns:
+          dict: 'audio_streams', 'tracks' (to analyze), 'cached' (ffprobe index -> (language, confidence,
+                model size)), 'resumed' (same, taken from the checkpoint), 'pending' (tracks still to sample),
+                'tests' (ffprobe index -> SequentialLanguageTest) and 'activity' (ffprobe index -> per-second
+                speech activity, with --activity-map).
+        """
+        if self._analysis is not None:
+            return self._analysis
+
+        audio_streams = [s for s in self.media_info['streams'] if s['codec_type'] == 'audio']
+        tracks = self.get_tracks_to_analyze(audio_streams)
+
+        # Tracks already analyzed in a previous run (same file version, same model) are answered by the cache
+        cached = {}
+        pending = []
+        if self.cache is not None and tracks:
+            identity = file_identity(self.file_path)
+            for track in tracks:
+                detection = self._trusted_verdict(
+                    lambda model_size: self.cache.get_detection(self.file_path, identity, track['stream'], model_size)
+                )
+                if detection is None:
+                    pending.append(track)
+                else:
+                    cached[track['ffprobe_index']] = detection
+        else:
+            pending = list(tracks)
+
+        # Tracks concluded by an interrupted run (--resume) on the same file version, with the same model
+        resumed = {}
+        if self.checkpoint is not None and pending:
+            verdicts = {model_size: self.checkpoint.track_verdicts(self.file_path, model_size)
+                        for model_size in (self.whisper_model_size, self.cascade_model) if model_size}
+            for track in pending:
+                verdict = self._trusted_verdict(lambda model_size: verdicts[model_size].get(track['ffprobe_index']))
+                if verdict is not None:
+                    resumed[track['ffprobe_index']] = verdict
+            pending = [track for track in pending if track['ffprobe_index'] not in resumed]
+
+        # Speech density of every candidate window, from one low sample rate pass over the tracks
+        activity = None
+        position_scores = {}
+        if self.activity_map and pending:
+            activity = self.compute_activity_map(pending)
+            if activity is not None:
+                position_scores = {index: self._position_scores(scores) for index, scores in activity.items()}
+
+        # With a cascade, the light model must clear the threshold plus the margin on its own;
+        # a rejection against that stricter band escalates the track early.
+        first_threshold = self.confidence_threshold
+        if self.cascade_model:
+            first_threshold = min(100, self.confidence_threshold + self.cascade_margin)
+
+        self._analysis = {
+            'audio_streams': audio_streams,
+            'tracks': tracks,
+            'cached': cached,
+            'resumed': resumed,
+            'pending': pending,
+            'tests': {
+                track['ffprobe_index']: SequentialLanguageTest(
+                    first_threshold, position_scores=position_scores.get(track['ffprobe_index'])
+                )
+                for track in pending
+            },
+            'activity': activity or {}
+        }
+        return self._analysis
+
+    def compute_activity_map(self, tracks):
+        """
+        Computes a per-second speech activity score of the given audio tracks with one ffmpeg read.
+
+        The tracks are decoded together at 8 kHz, band-limited to the voice range (200-3400 Hz) and
+        merged into one multichannel stream. For every second the energy of 50 ms frames is measured:
+        speech is loud compared to the track's noise floor and strongly modulated (syllables), while
+        silence is quiet and music beds are loud but steady.
+
+        Arguments:
+          tracks (list): tracks as returned by get_tracks_to_analyze.
+
+        Returns:
+          dict: ffprobe index -> numpy.ndarray of per-second scores (0-1); None on error.
+        """
+        import numpy as np
+
+        rate = 8000
+        frame = rate // 20
+        channels = len(tracks)
+
+        filters = [
+            f"[0:a:{track['relative_index']}]aresample={rate},aformat=sample_fmts=s16:channel_layouts=mono,"
+            f"highpass=f=200,lowpass=f=3400[a{i}]"
+            for i, track in enumerate(tracks)
+        ]
+        if channels > 1:
+            filters.append(''.join(f'[a{i}]' for i in range(channels)) + f'amerge=inputs={channels}[out]')
+            output = '[out]'
+        else:
+            output = '[a0]'
+        cmd = [
+            'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error',
+            '-i', str(self.file_path),
+            '-filter_complex', ';'.join(filters),
+            '-map', output,
+            '-f', 's16le', '-'
+        ]
+
+        start = time.perf_counter()
+        second_bytes = rate * channels * 2
+        chunk = bytearray(second_bytes)
+        chunk_view = memoryview(chunk)
+        loudness = []
+        modulation = []
+        try:
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0) as process:
+                while True:
+                    if self.interrupted:
+                        process.kill()
+                        return None
+                    received = 0
+                    while received < second_bytes:
+                        count = process.stdout.readinto(chunk_view[received:])
+                        if not count:
+                            break
+                        received += count
+                    usable = received - received % (frame * channels * 2)
+                    if not usable:
+                        break
+
+                    samples = np.frombuffer(chunk_view[:usable], dtype=np.int16).astype(np.float32)
+                    frame_power = np.mean(samples.reshape(-1, frame, channels) ** 2, axis=1)
+                    loudness.append(10 * np.log10(frame_power.mean(axis=0) + 1.0))
+                    modulation.append((10 * np.log10(frame_power + 1.0)).std(axis=0))
+                    if received < second_bytes:
+                        break
+                process.wait()
+            if process.returncode != 0 or not loudness:
+                self.logger.debug("Activity map not available, samples will be spread evenly")
+                return None
+        except Exception as e:
+            self.logger.debug(f"Activity map error: {str(e)}")
+            return None
+
+        loudness = np.array(loudness)
+        modulation = np.array(modulation)
+        noise_floor = np.percentile(loudness, 10, axis=0)
+        scores = np.clip((loudness - noise_floor) / 20, 0, 1) * np.clip(modulation / 6, 0, 1)
+
+        self.logger.debug(f"Activity map of {len(loudness)}s computed in {time.perf_counter() - start:.2f}s")
+        return {track['ffprobe_index']: scores[:, i] for i, track in enumerate(tracks)}
+
+    def _position_scores(self, scores):
+        """
+        Returns the mean activity score of the sample window starting at every position (percentage).
+        """
+        import numpy as np
+
+        cumulative = np.concatenate(([0.0], np.cumsum(scores)))
+        seconds = len(scores)
+        position_scores = {}
+        for position in range(0, 101):
+            start = min(seconds, int(self.total_duration * position / 100))
+            end = min(seconds, start + int(self.window_policy.context_seconds))
+            position_scores[position] = float((cumulative[end] - cumulative[start]) / (end - start)) if end > start else 0.0
+        return position_scores
+
+    def _next_round(self, pending_tracks, tests):
+        """
+        Reserves the next sample positions of every pending track.
+
+        Returns:
+          tuple: (windows for extract_audio_samples, (ffprobe index, position) owning each window)
+        """
+        activity = self._prepare_analysis()['activity']
+        windows = []
+        owners = []
+        for track in pending_tracks:
+            ffprobe_index = track['ffprobe_index']
+            for start_percent in tests[ffprobe_index].next_positions(self.samples_per_round):
+                start_seconds = self.total_duration * start_percent / 100
+                spans = self.window_policy.spans(start_seconds, self.total_duration, activity.get(ffprobe_index))
+                windows.append((track['relative_index'], spans))
+                owners.append((ffprobe_index, start_percent))
+        return windows, owners
+
+    def _queue_round(self, pending_tracks, tests):
+        """
+        Reserves the next round and, if the pipeline has room, starts extracting it in background.
+        """
+        windows, owners = self._next_round(pending_tracks, tests)
+        future = None
+        if self.pipeline is not None and windows:
+            future = self.pipeline.submit(self.extract_audio_samples, windows, block=False)
+        return windows, owners, future
+
+    def prefetch(self):
+        """
+        Starts extracting the first round of samples in background, so that it overlaps with the
+        inference on the previous file. Does nothing without a pipeline or if it is full.
         """
-        try:
-            return round(psutil.virtual_memory().total / (1024 ** 3))
-        except Exception:
-            return 4  # Conservative value if RAM cannot be determined.
+        if self.pipeline is None or self._queued_round is not None or self.interrupted:
+            return
+        analysis = self._prepare_analysis()
+        if analysis['pending']:
+            self._queued_round = self._queue_round(analysis['pending'], analysis['tests'])
+
+    def _drop_queued_round(self):
+        if self._queued_round is not None:
+            _, _, future = self._queued_round
+            if future is not None:
+                self.pipeline.discard(future)
+            self._queued_round = None
 
     def process_file(self):
         """
         Main process for analyzing and possibly updating audio track tags.
         """
         if self.interrupted:
+            self._drop_queued_round()
             return False
 
         # Initialize the list to collect the results (only in json mode)
-        json_results = [] if self.json_output else None
+        self.json_results.clear()
+        start = time.perf_counter()
 
         if not self.json_output:
+            from tqdm import tqdm
             tqdm.write(f" - File analysis: {self.file_path}")
         
         if not self.file_path.exists():
             self.logger.error("File not found")
+            self._drop_queued_round()
             return False
 
         try:
             # Using the media_info obtained in __init__.
-            audio_streams = [s for s in self.media_info['streams'] if s['codec_type'] == 'audio']
+            analysis = self._prepare_analysis()
 
-            if not audio_streams:
+            if not analysis['audio_streams']:
                 self.logger.warning("No audio track found in the file")
                 return False
 
             # Select the tracks to be analyzed
-            tracks_to_analyze = self.get_tracks_to_analyze(audio_streams)
+            tracks_to_analyze = analysis['tracks']
             
             if not tracks_to_analyze:
                 self.logger.info("There are no unknown audio tracks to analyze")
@@ -235,189 +1866,435 @@ class AudioMediaChecker:
             self.logger.info(f"Analysis of {num_tracks} audio {'tracks' if num_tracks > 1 else 'track'}")
             self.logger.info("--" * 30)
             
-            first_attempt_positions = [10, 35, 60, 85]
-            first_attempt_duration = 30
-
             for track in tracks_to_analyze:
+                self.log_stream_info(track['stream'])
+                self.logger.info("--" * 30)
+
+            for ffprobe_index, (detected_lang, confidence, model_size) in analysis['cached'].items():
+                self.logger.info(f"Track {ffprobe_index}: detection taken from the cache")
+                self._track_metrics(ffprobe_index)['cached'] = True
+                self.conclude_track(ffprobe_index, detected_lang, confidence * 100,
+                                    detected_lang is not None and confidence * 100 >= self.confidence_threshold,
+                                    model_size=model_size)
+
+            for ffprobe_index, (detected_lang, confidence, _) in analysis['resumed'].items():
+                self.logger.info(f"Track {ffprobe_index}: verdict taken from the checkpoint of the interrupted run")
+                self.conclude_track(ffprobe_index, detected_lang, confidence * 100,
+                                    detected_lang is not None and confidence * 100 >= self.confidence_threshold,
+                                    checkpoint=False)
+
+            # Every track gets its own sequential test; each round extracts the next samples of all
+            # the undecided tracks with one ffmpeg run and detects them as one batch.
+            # With a pipeline, extraction runs in background threads: the first round may already have
+            # been started by prefetch(), and from the second round on the next round is extracted
+            # while the model works on the current one (tracks needing a 3rd round are likely to need more).
+            tests = analysis['tests']
+            pending_tracks = list(analysis['pending'])
+            round_number = 0
+            # Fresh detections (stream, language, confidence, model that decided), stored in the cache
+            # at the end (after any tag update changed the file)
+            new_detections = []
+            # With --dedup: fingerprint of every track, and the tracks of this file with the same audio
+            # as another one (ffprobe index -> list of duplicate tracks)
+            fingerprints = {}
+            duplicates = {}
+            # With --cascade: tracks handed over from the cascade model to the configured one
+            escalated = set()
+
+            while pending_tracks:
                 if self.interrupted:
                     return False
 
-                stream = track['stream']
-                # Relative index for ffmpeg
-                audio_position = track['relative_index']
-                # Absolute index as reported by ffprobe (used for mkvpropedit and log).
-                ffprobe_index = track['ffprobe_index']
+                round_number += 1
+                if self._queued_round is None:
+                    self._queued_round = self._next_round(pending_tracks, tests) + (None,)
+                windows, owners, future = self._queued_round
+                self._queued_round = None
 
-                self.log_stream_info(stream)
-                self.logger.info("--" * 30)
+                samples = self.pipeline.take(future) if future is not None else self.extract_audio_samples(windows)
+                if self.interrupted:
+                    return False
+
+                if round_number >= 2:
+                    self._queued_round = self._queue_round(pending_tracks, tests)
+
+                for ffprobe_index in {owner for owner, _ in owners}:
+                    self._track_metrics(ffprobe_index)['extraction_calls'] += 1
+                for (ffprobe_index, _), sample in zip(owners, samples):
+                    if sample is not None:
+                        self._track_metrics(ffprobe_index)['pcm_bytes'] += sample.nbytes
+
+                if self.dedup and round_number == 1:
+                    pending_tracks = self._deduplicate_tracks(pending_tracks, owners, samples, fingerprints,
+                                                              duplicates, new_detections)
+                    # The samples of the tracks answered by their fingerprint are not analyzed
+                    pending_indexes = {track['ffprobe_index'] for track in pending_tracks}
+                    samples = [sample if ffprobe_index in pending_indexes else None
+                               for (ffprobe_index, _), sample in zip(owners, samples)]
+
+                inference_start = self.inference_seconds
+                if self.cascade_model:
+                    # The cascade model classifies the tracks not escalated yet, the configured model the others
+                    detections = self.detect_languages(
+                        [None if owner in escalated else sample for (owner, _), sample in zip(owners, samples)],
+                        self.cascade_model
+                    )
+                    escalated_detections = self.detect_languages(
+                        [sample if owner in escalated else None for (owner, _), sample in zip(owners, samples)]
+                    )
+                    detections = [detection if detection is not None else escalated_detection
+                                  for detection, escalated_detection in zip(detections, escalated_detections)]
+                else:
+                    detections = self.detect_languages(samples)
+                del samples
+                analyzed = sum(1 for detection in detections if detection is not None)
+                sample_seconds = (self.inference_seconds - inference_start) / analyzed if analyzed else 0.0
+
+                pending_indexes = {track['ffprobe_index'] for track in pending_tracks}
+                for (ffprobe_index, start_percent), detection in zip(owners, detections):
+                    # Samples of tracks decided while they were being prefetched are not needed anymore
+                    if ffprobe_index not in pending_indexes:
+                        continue
+                    if detection is None:
+                        tests[ffprobe_index].discard()
+                        continue
+                    detected_lang, confidence = detection
+                    tests[ffprobe_index].add(detected_lang, confidence)
+                    track_metrics = self._track_metrics(ffprobe_index)
+                    track_metrics['attempts'] += 1
+                    track_metrics['inference_seconds'] += sample_seconds
+                    if ffprobe_index in escalated:
+                        track_metrics['escalated_samples'] += 1
+                    self.logger.info(
+                        f"Round {round_number} - Track {ffprobe_index} - Position {start_percent}%: "
+                        f"Language detected '{detected_lang}', Confidence {confidence * 100:.2f}%"
+                    )
 
-                attempt_successful = False
+                still_pending = []
+                for track in pending_tracks:
+                    ffprobe_index = track['ffprobe_index']
+                    test = tests[ffprobe_index]
+                    decision = test.decision()
 
-                # First attempt
-                self.logger.info(f"Attempt 1 - Track with ffprobe index {ffprobe_index}")
-                self.logger.info("--" * 30)
+                    if decision is None:
+                        still_pending.append(track)
+                        continue
 
-                first_attempt_confidences = {}
-                for start_percent in first_attempt_positions:
-                    audio_segment = self.extract_audio_sample(audio_position, start_percent, first_attempt_duration)
-                    if audio_segment is None:
+                    if (self.cascade_model and ffprobe_index not in escalated
+                            and decision == SequentialLanguageTest.REJECT):
+                        _, cascade_percent = test.leader()
+                        self.logger.info(
+                            f"Track {ffprobe_index}: model '{self.cascade_model}' not confident enough "
+                            f"({cascade_percent:.2f}%), escalating to '{self.whisper_model_size}'"
+                        )
+                        escalated.add(ffprobe_index)
+                        self._track_metrics(ffprobe_index)['escalated'] = True
+                        # A new test for the configured model, on positions not sampled yet
+                        escalated_test = SequentialLanguageTest(self.confidence_threshold,
+                                                                position_scores=test.position_scores)
+                        escalated_test.used_positions = list(test.used_positions)
+                        escalated_test.outstanding = test.outstanding
+                        escalated_test.failed = test.failed
+                        tests[ffprobe_index] = escalated_test
+                        still_pending.append(track)
                         continue
-                    detected_lang, confidence = self.detect_language(audio_segment)
-                        
-                    if detected_lang not in first_attempt_confidences:
-                        first_attempt_confidences[detected_lang] = {'total_confidence': 0, 'count': 0}
-                    first_attempt_confidences[detected_lang]['total_confidence'] += confidence
-                    first_attempt_confidences[detected_lang]['count'] += 1
-
-                    self.logger.info(f"Position {start_percent}%: Language detected '{detected_lang}', Confidence {confidence * 100:.2f}%")
-
-                # Save only if there are detections.
-                if first_attempt_confidences:
-                    total_detections = sum(lang_data['count'] for lang_data in first_attempt_confidences.values())
-                    first_attempt_weighted_averages = {}
-                    for lang, stats in first_attempt_confidences.items():
-                        average_confidence = stats['total_confidence'] / stats['count']
-                        weighted_average = (average_confidence * stats['count']) / total_detections
-                        first_attempt_weighted_averages[lang] = weighted_average * 100
 
                     self.logger.info("--" * 30)
-                    self.logger.info("Weighted averages of the confidences of each language surveyed:")
-                    for lang, weighted_avg in first_attempt_weighted_averages.items():
+                    self.logger.info(f"Weighted averages of the confidences of each language surveyed for track {ffprobe_index}:")
+                    for lang, weighted_avg in test.weighted_averages().items():
                         self.logger.info(f"-> {lang}: {weighted_avg:.2f}%")
 
-                    detected_lang = max(first_attempt_weighted_averages, key=first_attempt_weighted_averages.get)
-                    confidence_percent = first_attempt_weighted_averages[detected_lang]
-                else:
-                    detected_lang = None
-                    confidence_percent = 0
+                    detected_lang, confidence_percent = test.leader()
+                    self.logger.info(f"Language with higher weighted average: '{detected_lang}', Weighted average: {confidence_percent:.2f}%")
+                    self.logger.info(f"Decision for track {ffprobe_index} after {test.samples} samples")
+
+                    # Verdicts are stored under the model that took them: a cascade verdict is not
+                    # a verdict of the configured model
+                    verdict_model = self.whisper_model_size
+                    if self.cascade_model and ffprobe_index not in escalated:
+                        verdict_model = self.cascade_model
+
+                    self.conclude_track(ffprobe_index, detected_lang, confidence_percent,
+                                        decision == SequentialLanguageTest.ACCEPT, model_size=verdict_model)
+                    new_detections.append((track['stream'], detected_lang, confidence_percent / 100, verdict_model))
+
+                    if ffprobe_index in fingerprints:
+                        self._store_fingerprint_verdict(fingerprints[ffprobe_index], detected_lang,
+                                                        confidence_percent / 100, verdict_model)
+                    for duplicate in duplicates.get(ffprobe_index, []):
+                        self.logger.info(f"Track {duplicate['ffprobe_index']}: same audio as track {ffprobe_index}, verdict reused")
+                        self._track_metrics(duplicate['ffprobe_index'])['deduplicated'] = True
+                        self.conclude_track(duplicate['ffprobe_index'], detected_lang, confidence_percent,
+                                            decision == SequentialLanguageTest.ACCEPT, model_size=verdict_model)
+                        new_detections.append((duplicate['stream'], detected_lang, confidence_percent / 100,
+                                               verdict_model))
+
+                pending_tracks = still_pending
+
+            self.apply_language_tags()
+
+            if self.cache is not None and new_detections:
+                identity = file_identity(self.file_path)
+                for stream, detected_lang, confidence, model_size in new_detections:
+                    self.cache.put_detection(self.file_path, identity, stream, model_size, detected_lang, confidence)
+
+            self.json_results.sort(key=lambda result: result['track'])
+            if escalated:
+                escalated_samples = sum(self._track_metrics(index)['escalated_samples'] for index in escalated)
+                self.logger.info(f"Cascade: {len(escalated)} {'tracks' if len(escalated) > 1 else 'track'} "
+                                 f"({escalated_samples} samples) escalated to '{self.whisper_model_size}'")
+            self.log_timings()
+            return True
 
-                self.logger.info("--" * 30)
-                self.logger.info(f"Language with higher weighted average: '{detected_lang}', Weighted average: {confidence_percent:.2f}%")
+        except Exception as e:
+            self.logger.error(f"Error during file processing: {str(e)}", exc_info=self.verbose)
+            return False
 
-                if confidence_percent >= self.confidence_threshold:
-                    self.logger.info(
-                        f"Attempt 1 successful for trace with ffprobe index {ffprobe_index}. "
-                        f"Language detected: {detected_lang}, Confidence: {confidence_percent:.2f}% >= {self.confidence_threshold}%"
-                    )
-                    self.handle_detection_result(ffprobe_index, detected_lang, confidence_percent / 100)
-
-                    attempt_successful = True
-
-                    # Collect results in json mode
-                    if self.json_output:
-                        # Converti il codice lingua da ISO 639-1 (2 char) a ISO 639-2 (3 char)
-                        try:
-                            detected_lang_3 = pycountry.languages.get(alpha_2=detected_lang).alpha_3
-                        except (AttributeError, KeyError):
-                            self.logger.warning(f"Language code not found for {detected_lang}. Using the original code.")
-                            detected_lang_3 = detected_lang
-                        
-                        json_results.append({
-                            "track": ffprobe_index,
-                            "language": detected_lang_3
-                        })
+        finally:
+            # A round prefetched for tracks that got decided in the meantime
+            self._drop_queued_round()
+            # Decisions taken before an interruption or an error are still written
+            self.apply_language_tags()
+            self.processing_seconds += time.perf_counter() - start
 
-                    self.logger.info("--" * 30)
-                    continue
+    def _deduplicate_tracks(self, pending_tracks, owners, samples, fingerprints, duplicates, new_detections):
+        """
+        Fingerprints the first round of samples of every pending track (--dedup).
+        Tracks whose fingerprint already has a verdict (earlier in the run, or in the cache) are
+        concluded with it; tracks with the same audio, codec and channel count as another track of the
+        file wait for its verdict.
 
-                self.logger.info(f"Attempt 1 failed. Weighted average: {confidence_percent:.2f}% < {self.confidence_threshold}%")
-                self.logger.info("--" * 30)
+        Returns:
+          list: the tracks still to analyze.
+        """
+        still_pending = []
+        first_with_stream = {}
+        for track in pending_tracks:
+            ffprobe_index = track['ffprobe_index']
+            track_samples = [sample for (owner, _), sample in zip(owners, samples) if owner == ffprobe_index]
+            fingerprint = audio_fingerprint(track_samples, self.total_duration, self.window_policy.sample_rate)
+            if fingerprint is None:
+                still_pending.append(track)
+                continue
+            fingerprints[ffprobe_index] = fingerprint
+
+            verdict = self._fingerprint_verdict(fingerprint)
+            if verdict is not None:
+                detected_lang, confidence, model_size = verdict
+                self.logger.info(f"Track {ffprobe_index}: same audio as a track already analyzed, verdict reused")
+                self._track_metrics(ffprobe_index)['deduplicated'] = True
+                self.conclude_track(ffprobe_index, detected_lang, confidence * 100,
+                                    detected_lang is not None and confidence * 100 >= self.confidence_threshold,
+                                    model_size=model_size)
+                new_detections.append((track['stream'], detected_lang, confidence, model_size))
+            else:
+                # The fingerprint only covers the first samples: a different encoding or channel
+                # layout (e.g. a commentary mixed over the same opening) is analyzed on its own
+                stream_key = (fingerprint, track['stream'].get('codec_name'), track['stream'].get('channels'))
+                if stream_key in first_with_stream:
+                    duplicates.setdefault(first_with_stream[stream_key], []).append(track)
+                else:
+                    first_with_stream[stream_key] = ffprobe_index
+                    still_pending.append(track)
+        return still_pending
 
-                # Subsequent attempts
-                used_positions = set(first_attempt_positions)
-                for attempt in range(2, 11):
-                    attempt_duration = random.randint(30, 90)
-                    attempt_positions = []
-                        
-                    while len(attempt_positions) < 4:
-                        new_position = random.randint(5, 95)
-                        if new_position not in used_positions:
-                            attempt_positions.append(new_position)
-                            used_positions.add(new_position)
-
-                    self.logger.info(f"Attempt {attempt} - Track with ffprobe index {ffprobe_index}")
-                    self.logger.info("--" * 30)
+    def _trusted_verdict(self, lookup):
+        """
+        Looks up a stored verdict with 'lookup(model_size)' -> (language, confidence) or None.
+        Verdicts of the configured model come first; with --cascade, the ones of the cascade model are
+        used only if they clear the threshold plus the margin, as a fresh cascade verdict must.
 
-                    attempt_confidences = {}
-                    for start_percent in attempt_positions:
-                        audio_segment = self.extract_audio_sample(audio_position, start_percent, attempt_duration)
-                        if audio_segment is None:
-                            continue
-                        detected_lang, confidence = self.detect_language(audio_segment)
-                            
-                        if detected_lang not in attempt_confidences:
-                            attempt_confidences[detected_lang] = {'total_confidence': 0, 'count': 0}
-                        attempt_confidences[detected_lang]['total_confidence'] += confidence
-                        attempt_confidences[detected_lang]['count'] += 1
-
-                        self.logger.info(f"Position {start_percent}%: Language detected '{detected_lang}', Confidence {confidence * 100:.2f}%")
-
-                    if attempt_confidences:
-                        total_detections = sum(lang_data['count'] for lang_data in attempt_confidences.values())
-                        attempt_weighted_averages = {}
-                        for lang, stats in attempt_confidences.items():
-                            average_confidence = stats['total_confidence'] / stats['count']
-                            weighted_average = (average_confidence * stats['count']) / total_detections
-                            attempt_weighted_averages[lang] = weighted_average * 100
-
-                        self.logger.info("--" * 30)
-                        self.logger.info("Weighted averages of the confidences of each language surveyed:")
-                        for lang, weighted_avg in attempt_weighted_averages.items():
-                            self.logger.info(f"-> {lang}: {weighted_avg:.2f}%")
-
-                        detected_lang = max(attempt_weighted_averages, key=attempt_weighted_averages.get)
-                        confidence_percent = attempt_weighted_averages[detected_lang]
-                    else:
-                        detected_lang = None
-                        confidence_percent = 0
+        Returns:
+          tuple: (language, confidence, model size), None if there is no usable verdict.
+        """
+        candidates = [(self.whisper_model_size, False)]
+        if self.cascade_model:
+            candidates.append((self.cascade_model, True))
+        for model_size, needs_margin in candidates:
+            verdict = lookup(model_size)
+            if verdict is None:
+                continue
+            detected_lang, confidence = verdict
+            if needs_margin and (detected_lang is None
+                                 or confidence * 100 < self.confidence_threshold + self.cascade_margin):
+                continue
+            return detected_lang, confidence, model_size
+        return None
+
+    def _fingerprint_verdict(self, fingerprint):
+        """
+        Returns the (language, confidence, model size) of an audio fingerprint, from this run or the cache;
+        None if unknown.
+        """
+        def lookup(model_size):
+            with _fingerprint_verdicts_lock:
+                verdict = _fingerprint_verdicts.get((fingerprint, model_size))
+            if verdict is None and self.cache is not None:
+                verdict = self.cache.get_fingerprint(fingerprint, model_size)
+            return verdict
+
+        return self._trusted_verdict(lookup)
+
+    def _store_fingerprint_verdict(self, fingerprint, detected_lang, confidence, model_size):
+        with _fingerprint_verdicts_lock:
+            _fingerprint_verdicts[(fingerprint, model_size)] = (detected_lang, confidence)
+        if self.cache is not None:
+            self.cache.put_fingerprint(fingerprint, model_size, detected_lang, confidence)
+
+    def conclude_track(self, ffprobe_index, detected_lang, confidence_percent, accepted, checkpoint=True,
+                       model_size=None):
+        """
+        Logs the final verdict of a track, updates its tag if accepted and collects the json result.
 
-                    self.logger.info(f"Language with higher weighted average: '{detected_lang}', Weighted average: {confidence_percent:.2f}%")
+        Arguments:
+          ffprobe_index (int): stream index (ffprobe).
+          detected_lang (str): leading language (ISO 639-1), None if nothing was detected.
+          confidence_percent (float): weighted average of the leading language (percentage).
+          accepted (bool): True if the detection is reliable enough to be applied.
+          checkpoint (bool): record the verdict in the checkpoint (False for verdicts taken from it).
+          model_size (str): model that took the verdict, None for the configured one.
+        """
+        self._track_metrics(ffprobe_index)['confidence'] = confidence_percent
+        if checkpoint and self.checkpoint is not None:
+            self.checkpoint.record_track(self.file_path, ffprobe_index, detected_lang, confidence_percent / 100,
+                                         model_size or self.whisper_model_size)
+        if accepted:
+            self.logger.info(
+                f"Detection successful for trace with ffprobe index {ffprobe_index}. "
+                f"Language detected: {detected_lang}, Confidence: {confidence_percent:.2f}% >= {self.confidence_threshold}%"
+            )
+            self.handle_detection_result(ffprobe_index, detected_lang, confidence_percent / 100)
+            self.record_json_result(ffprobe_index, detected_lang)
+        else:
+            self.logger.info(
+                f"Detection failed for trace with ffprobe index {ffprobe_index}. "
+                f"Weighted average: {confidence_percent:.2f}% < {self.confidence_threshold}%"
+            )
+            # If the detection was not successful, add "und"
+            self.record_json_result(ffprobe_index, None)
+        self.logger.info("--" * 30)
 
-                    if confidence_percent >= self.confidence_threshold:
-                        self.logger.info(
-                            f"Attempt {attempt} successful for trace with ffprobe index {ffprobe_index}. "
-                            f"Language detected: {detected_lang}, Confidence: {confidence_percent:.2f}% >= {self.confidence_threshold}%"
-                        )
-                        self.handle_detection_result(ffprobe_index, detected_lang, confidence_percent / 100)
-
-                        attempt_successful = True
-
-                        # Collect results in json mode
-                        if self.json_output:
-                            # Converti il codice lingua da ISO 639-1 (2 char) a ISO 639-2 (3 char)
-                            try:
-                                detected_lang_3 = pycountry.languages.get(alpha_2=detected_lang).alpha_3
-                            except (AttributeError, KeyError):
-                                self.logger.warning(f"Language code not found for {detected_lang}. Using the original code.")
-                                detected_lang_3 = detected_lang
-                            
-                            json_results.append({
-                                "track": ffprobe_index,
-                                "language": detected_lang_3
-                            })
-
-                        self.logger.info("--" * 30)
-                        break
+    def record_json_result(self, ffprobe_index, detected_lang):
+        """
+        Collects the result of a track for the json output (only in json mode).
 
-                    self.logger.info(f"Attempt {attempt} failed. Weighted average: {confidence_percent:.2f}% < {self.confidence_threshold}%")
-                    self.logger.info("--" * 30)
+        Arguments:
+          ffprobe_index (int): stream index (ffprobe).
+          detected_lang (str): detected language (ISO 639-1), None if the detection failed.
+        """
+        if not self.json_output:
+            return
 
-                # If no attempt was successful, add "und"
-                if not attempt_successful and self.json_output:
-                    json_results.append({
-                        "track": ffprobe_index,
-                        "language": "und"
-                    })
+        if detected_lang is None:
+            detected_lang_3 = "und"
+        else:
+            # Converti il codice lingua da ISO 639-1 (2 char) a ISO 639-2 (3 char)
+            import pycountry
+            try:
+                detected_lang_3 = pycountry.languages.get(alpha_2=detected_lang).alpha_3
+            except (AttributeError, KeyError):
+                self.logger.warning(f"Language code not found for {detected_lang}. Using the original code.")
+                detected_lang_3 = detected_lang
+
+        result = {
+            "track": ffprobe_index,
+            "language": detected_lang_3
+        }
+        if self.metrics:
+            result["metrics"] = self.track_metrics_summary(ffprobe_index)
+        self.json_results.append(result)
 
-            # Print final JSON only in json mode
-            if self.json_output and json_results:
-                print(json.dumps(json_results, indent=2))
+    def _track_metrics(self, ffprobe_index):
+        """
+        Returns the counters of a track: rounds extracted, bytes of PCM, samples analyzed (attempts),
+        inference time, final confidence, whether it came from the cache or from identical audio, and
+        whether it was escalated from the cascade model (with the samples analyzed after that).
+        """
+        return self.track_metrics.setdefault(ffprobe_index, {
+            'extraction_calls': 0,
+            'pcm_bytes': 0,
+            'attempts': 0,
+            'inference_seconds': 0.0,
+            'confidence': None,
+            'cached': False,
+            'deduplicated': False,
+            'escalated': False,
+            'escalated_samples': 0
+        })
+
+    def track_metrics_summary(self, ffprobe_index):
+        """
+        Returns the metrics of a track for the json output (times in ms; probe and model load are per file).
+        """
+        track_metrics = self._track_metrics(ffprobe_index)
+        attempts = track_metrics['attempts']
+        confidence = track_metrics['confidence']
+        return {
+            "probe_ms": round(self.probe_seconds * 1000, 1),
+            "model_load_ms": round(self.model_load_seconds * 1000, 1),
+            "extraction_calls": track_metrics['extraction_calls'],
+            "pcm_bytes": track_metrics['pcm_bytes'],
+            "inference_ms_per_sample": round(track_metrics['inference_seconds'] * 1000 / attempts, 1) if attempts else 0.0,
+            "attempts": attempts,
+            "confidence": round(confidence, 2) if confidence is not None else None,
+            "cached": track_metrics['cached'],
+            "deduplicated": track_metrics['deduplicated'],
+            "escalated": track_metrics['escalated'],
+            "escalated_samples": track_metrics['escalated_samples']
+        }
 
-            return True
+    def untagged_audio_tracks(self):
+        """
+        Returns the number of audio tracks that still have no language tag (tags written by this run included).
+        """
+        _, untagged = count_untagged_audio(self.media_info)
+        for stream in self.media_info['streams']:
+            tags = stream.get('tags', {})
+            if stream.get('index') in self.updated_tracks and not (tags.get('LANGUAGE') or tags.get('language')):
+                untagged -= 1
+        return untagged
 
-        except Exception as e:
-            self.logger.error(f"Error during file processing: {str(e)}", exc_info=self.verbose)
-            return False
+    def summary(self, success):
+        """
+        Returns the outcome of process_file for the caller.
+
+        Arguments:
+          success (bool): value returned by process_file.
+
+        Returns:
+          dict: file, success, json results, number of audio tracks still untagged and of header rewrites,
+                and the metrics of the file (see RunMetrics).
+        """
+        concluded = [m for m in self.track_metrics.values() if m['confidence'] is not None]
+        return {
+            'file': str(self.file_path),
+            'success': success,
+            'json_results': self.json_results,
+            'untagged_tracks': self.untagged_audio_tracks(),
+            'header_rewrites': self.header_rewrites,
+            'metrics': {
+                'tracks': len(concluded),
+                'cached_tracks': sum(1 for m in concluded if m['cached']),
+                'deduplicated_tracks': sum(1 for m in concluded if m['deduplicated']),
+                'escalated_tracks': sum(1 for m in self.track_metrics.values() if m['escalated']),
+                'escalated_samples': sum(m['escalated_samples'] for m in self.track_metrics.values()),
+                'samples': sum(m['attempts'] for m in self.track_metrics.values()),
+                'extraction_calls': self.extraction_calls,
+                'pcm_bytes': self.pcm_bytes,
+                'probe_seconds': self.probe_seconds,
+                'model_load_seconds': self.model_load_seconds,
+                'inference_seconds': self.inference_seconds,
+                'processing_seconds': self.processing_seconds
+            }
+        }
+
+    def log_timings(self):
+        """
+        Logs the time spent loading the Whisper model and the time spent on inference.
+        """
+        self.logger.info(f"Model load time: {self.model_load_seconds:.2f}s - Inference time: {self.inference_seconds:.2f}s")
+        self.logger.debug(f"Probe time: {self.probe_seconds:.2f}s - Extraction runs: {self.extraction_calls} "
+                          f"({self.pcm_bytes / 2 ** 20:.1f} MiB of PCM)")
 
     def get_tracks_to_analyze(self, audio_streams):
         """Select the audio tracks to be analyzed according to the parameters.
@@ -426,19 +2303,7 @@ class AudioMediaChecker:
         - 'relative_index': the relative index among the audio tracks only (for ffmpeg)
         - 'ffprobe_index': the absolute index of the stream, as reported by ffprobe
         """
-        tracks = []
-        relative_index = 0
-        for stream in audio_streams:
-            tags = stream.get('tags', {})
-            current_lang = tags.get('LANGUAGE', None) or tags.get('language', None)
-            if self.check_all_tracks or not current_lang:
-                tracks.append({
-                    'stream': stream,
-                    'relative_index': relative_index,   # To use in ffmpeg: 0:a:{relative_index}
-                    'ffprobe_index': stream.get('index')  # Use with mkvpropedit to identify the exact track
-                })
-            relative_index += 1
-        return tracks
+        return select_audio_tracks(audio_streams, self.check_all_tracks)
 
     def log_stream_info(self, stream):
         """
@@ -469,6 +2334,7 @@ class AudioMediaChecker:
         """
         self.logger.debug(f"Start handle_detection_result for trace {stream_index}")
 
+        import pycountry
         try:
             detected_lang_3 = pycountry.languages.get(alpha_2=detected_lang).alpha_3
         except AttributeError:
@@ -511,10 +2377,33 @@ class AudioMediaChecker:
 
     def get_media_info(self):
         """
-        Extracts media file information using ffprobe.
+        Extracts media file information using ffprobe (or from the cache, if the file is unchanged).
+        Returns:
+          dict: information in JSON format.
+        """
+        if self.cache is not None:
+            identity = file_identity(self.file_path)
+            media_info = self.cache.get_media_info(self.file_path, identity)
+            if media_info is not None:
+                self.logger.debug("Media information taken from the cache")
+                return media_info
+            media_info = self._run_ffprobe()
+            self.cache.put_media_info(self.file_path, identity, media_info)
+            return media_info
+        return self._run_ffprobe()
+
+    def _run_ffprobe(self):
+        """
+        Runs ffprobe on the file (or reads the Matroska header natively, with --native-probe).
         Returns:
           dict: information in JSON format.
         """
+        if self.native_probe and self.file_path.suffix.lower() in MATROSKA_EXTENSIONS:
+            media_info = read_matroska_info(self.file_path)
+            if media_info is not None:
+                return media_info
+            self.logger.debug("Native Matroska reader could not handle the file, using ffprobe")
+
         cmd = [
             'ffprobe',
             '-v', 'quiet',
@@ -531,6 +2420,9 @@ class AudioMediaChecker:
     def update_language_tag(self, stream_index, language):
         """
         Updates the language tag for the track identified by stream_index.
+
+        The update is only queued: all the tags of a file are written together by
+        apply_language_tags, with a single mkvpropedit run (one header rewrite per file).
         
         Arguments:
           stream_index (int): stream index (ffprobe) to update the tag to.
@@ -543,20 +2435,10 @@ class AudioMediaChecker:
         # I check if the file is an mkv
         is_mkv = self.file_path.suffix.lower() == '.mkv'
 
-        cmd = [
-            'mkvpropedit',
-            str(self.file_path),
-            '--edit', f'track:{stream_index + 1}',  # mkvpropedit use index  base-1
-            '--set', f'language={language}'
-        ]
-
         if not self.dry_run:
             if is_mkv:
-                try:
-                    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-                    self.logger.info(f"Updated language tag for track {stream_index}: {language}")
-                except subprocess.CalledProcessError as e:
-                    self.logger.error(f"Error running mkvpropedit: {e.stderr}")
+                self.pending_tags[stream_index] = language
+                self.logger.info(f"Language tag update queued for track {stream_index}: {language}")
             else:
                 self.logger.info(f"File {self.file_path.name} is not MKV format - language tag update skipped")
         else:
@@ -565,78 +2447,671 @@ class AudioMediaChecker:
             else:
                 self.logger.info(f"[DRY RUN] File {self.file_path.name} is not MKV format - would not be modified in normal mode")
 
+    def apply_language_tags(self):
+        """
+        Writes all the queued language tags of the file with a single mkvpropedit run.
+        Either every tag is written or none is (mkvpropedit rewrites the header once).
+        """
+        if not self.pending_tags:
+            return
+
+        pending_tags = self.pending_tags
+        self.pending_tags = {}
+
+        cmd = ['mkvpropedit', str(self.file_path)]
+        for stream_index, language in sorted(pending_tags.items()):
+            cmd += [
+                '--edit', f'track:{stream_index + 1}',  # mkvpropedit use index  base-1
+                '--set', f'language={language}'
+            ]
+
+        try:
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Error running mkvpropedit: {e.stderr or e.stdout}")
+            return
+
+        self.header_rewrites += 1
+        self.updated_tracks.update(pending_tags)
+        for stream_index, language in sorted(pending_tags.items()):
+            self.logger.info(f"Updated language tag for track {stream_index}: {language}")
+        self.logger.info(f"{len(pending_tags)} language {'tags' if len(pending_tags) > 1 else 'tag'} written with 1 header rewrite")
+
     def detect_language(self, audio_file):
         """
         Performs language detection using the (cached) Whisper model.
 
+        Only the encoder and the language-token probabilities are computed on the first
+        30 seconds of the sample; the full beam-search transcription runs only in verbose
+        mode, where the recognized text is logged.
+
         Arguments:
-          audio_file (file-like): audio sample in BytesIO format.
+          audio_file (numpy.ndarray): 16 kHz mono waveform (float32, or int16 from 's16le' extraction).
 
         Returns:
           tuple: (language detected (str), confidence (float))
         """
-        self.logger.info("Beginning language detection")
+        return self.detect_languages([audio_file])[0]
+
+    def detect_languages(self, audio_samples, model_size=None):
+        """
+        Performs language detection on several samples at once.
+
+        The samples are stacked into mel-spectrogram batches of up to 'batch_size' items and
+        each batch goes through a single encoder pass. In verbose mode every sample is
+        transcribed on its own, so that the recognized text can be logged.
+
+        Arguments:
+          audio_samples (list): numpy.ndarray waveforms; None entries (failed extractions) are skipped.
+          model_size (str): Whisper model to use, None for the configured one.
+
+        Returns:
+          list: (language detected (str), confidence (float)) per sample, None for the skipped ones.
+        """
+        results = [None] * len(audio_samples)
+        pending = [(i, sample) for i, sample in enumerate(audio_samples) if sample is not None]
+        if not pending:
+            return results
+
+        self.logger.info(f"Beginning language detection ({len(pending)} {'samples' if len(pending) > 1 else 'sample'})")
 
-        model = self._lazy_load_whisper()
-        segments, info = model.transcribe(audio_file, language=None, beam_size=5)
-        detected_language = info.language
+        model = self._lazy_load_whisper(model_size)
 
+        start = time.perf_counter()
         if self.verbose:
-            self.logger.debug("Recognized text:")
-            for segment in segments:
-                self.logger.debug(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
-            self.logger.info(f"Detected language: {detected_language} with confidence: {info.language_probability:.2f}")
+            for i, sample in pending:
+                segments, info = model.transcribe(self._as_float32(sample), language=None, beam_size=5)
+
+                self.logger.debug("Recognized text:")
+                for segment in segments:
+                    self.logger.debug(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
+                self.logger.info(f"Detected language: {info.language} with confidence: {info.language_probability:.2f}")
+                results[i] = (info.language, info.language_probability)
+        else:
+            for batch_start in range(0, len(pending), self.batch_size):
+                batch = pending[batch_start:batch_start + self.batch_size]
+                detections = self._identify_languages(model, [self._as_float32(sample) for _, sample in batch])
+                for (i, _), detection in zip(batch, detections):
+                    results[i] = detection
+        self.inference_seconds += time.perf_counter() - start
+
+        return results
+
+    @staticmethod
+    def _as_float32(audio):
+        """
+        Returns the waveform as float32 in [-1, 1], as expected by Whisper.
+        """
+        import numpy as np
 
-        return detected_language, info.language_probability
+        if audio.dtype != np.float32:
+            return audio.astype(np.float32) / 32768.0
+        return audio
 
-    def extract_audio_sample(self, audio_position, start_percent, duration_seconds):
+    @staticmethod
+    def _identify_languages(model, audios):
+        """
+        Language identification without decoding: log-mel features of one Whisper context
+        (30 s) per sample, one batched encoder pass and the probabilities of the language tokens.
+
+        Arguments:
+          model (WhisperModel): loaded model.
+          audios (list): 16 kHz mono float32 waveforms.
+
+        Returns:
+          list: (language detected (str), confidence (float)) per waveform.
+        """
+        import numpy as np
+
+        feature_extractor = model.feature_extractor
+        context_samples = feature_extractor.n_samples
+        context_frames = feature_extractor.nb_max_frames
+
+        batch = []
+        for audio in audios:
+            audio = audio[:context_samples]
+            if len(audio) < context_samples:
+                audio = np.pad(audio, (0, context_samples - len(audio)))
+
+            features = feature_extractor(audio)[:, :context_frames]
+            if features.shape[-1] < context_frames:
+                features = np.pad(features, ((0, 0), (0, context_frames - features.shape[-1])))
+            batch.append(features)
+
+        encoder_output = model.encode(np.stack(batch))
+        # For each sample, sorted list of (language token, probability), e.g. ('<|en|>', 0.97)
+        return [
+            (language_probs[0][0][2:-2], language_probs[0][1])
+            for language_probs in model.model.detect_language(encoder_output)
+        ]
+
+    def extract_audio_sample(self, audio_position, start_percent, duration_seconds, sample_format='f32le'):
         """
-        Extracts an audio sample in WAV format of the specified duration from a percentage of the file.
+        Extracts an audio sample of the specified duration from a percentage of the file.
 
         Arguments:
           audio_position (int): index of the audio track (for ffmpeg).
           start_percent (float): start percentage of the sample.
           duration_seconds (float): duration of the sample in seconds.
+          sample_format (str): raw PCM format requested to ffmpeg, 'f32le' or 's16le'.
         
         Return:
-          BytesIO: campione audio; None in caso di errore.
+          numpy.ndarray: 16 kHz mono waveform; None in caso di errore.
         """
-        try:
-            audio_sample = io.BytesIO()
-            
-            # Reuse self.total_duration if available
-            total_duration = self.total_duration
-            start_time_seconds = (total_duration * start_percent) / 100
-
-            extract_cmd = [
-                'ffmpeg', '-y',
-                '-ss', f'{start_time_seconds:.2f}',
-                '-i', str(self.file_path),
-                '-t', f'{duration_seconds:.2f}',
-                '-map', f'0:a:{audio_position}',
-                '-ac', '1',
-                '-ar', '16000',
-                '-acodec', 'pcm_s16le',
-                '-f', 'wav',
-                '-'
-            ]
+        start_seconds = (self.total_duration * start_percent) / 100
+        return self.extract_audio_samples([(audio_position, [(start_seconds, duration_seconds)])], sample_format)[0]
+
+    def extract_audio_samples(self, windows, sample_format='f32le'):
+        """
+        Extracts several audio samples (of one or more audio tracks) with a single ffmpeg run.
+
+        Every span of every window is opened as a separate input of the same ffmpeg process, so
+        each one is reached with a fast input seek instead of decoding the whole track. The spans
+        are resampled to 16 kHz mono, joined per window, padded to the exact window length and
+        concatenated into one raw PCM stream, which is read straight into a preallocated NumPy
+        array. Each returned sample is a view on that array, there is no WAV container and no
+        intermediate copy.
+
+        Arguments:
+          windows (list): (audio_position, spans) tuples, spans being (start_seconds, duration_seconds)
+                          tuples as returned by WindowPolicy.spans.
+          sample_format (str): 'f32le' (float32, ready for Whisper) or 's16le' (int16, half the memory).
+
+        Return:
+          list: one numpy.ndarray per window (same order); None for the windows that failed.
+        """
+        if not windows:
+            return []
+        if self.interrupted:
+            return [None] * len(windows)
+
+        import numpy as np
+
+        sample_rate = self.window_policy.sample_rate
+        dtype, ffmpeg_sample_fmt, codec = {
+            'f32le': (np.float32, 'flt', 'pcm_f32le'),
+            's16le': (np.int16, 's16', 'pcm_s16le')
+        }[sample_format]
+        lengths = [int(round(sum(duration for _, duration in spans) * sample_rate)) for _, spans in windows]
+
+        extract_cmd = ['ffmpeg', '-y', '-nostdin', '-hide_banner', '-loglevel', 'error']
+        filters = []
+        input_index = 0
+        for i, (audio_position, spans) in enumerate(windows):
+            labels = ''
+            for start_seconds, duration_seconds in spans:
+                extract_cmd += [
+                    '-ss', f'{start_seconds:.2f}',
+                    '-t', f'{duration_seconds:.2f}',
+                    '-i', str(self.file_path)
+                ]
+                filters.append(
+                    f'[{input_index}:a:{audio_position}]aresample={sample_rate},'
+                    f'aformat=sample_fmts={ffmpeg_sample_fmt}:channel_layouts=mono[s{input_index}]'
+                )
+                labels += f'[s{input_index}]'
+                input_index += 1
+            join = f'concat=n={len(spans)}:v=0:a=1,' if len(spans) > 1 else ''
+            filters.append(f'{labels}{join}apad=whole_len={lengths[i]},atrim=end_sample={lengths[i]}[w{i}]')
+        concat_inputs = ''.join(f'[w{i}]' for i in range(len(windows)))
+        filters.append(f'{concat_inputs}concat=n={len(windows)}:v=0:a=1[out]')
+        extract_cmd += [
+            '-filter_complex', ';'.join(filters),
+            '-map', '[out]',
+            '-acodec', codec,
+            '-f', sample_format,
+            '-'
+        ]
 
-            with subprocess.Popen(extract_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
-                stdout, stderr = process.communicate()
+        pcm = np.empty(sum(lengths), dtype=dtype)
+        pcm_bytes = memoryview(pcm).cast('B')
+        self.extraction_calls += 1
+        try:
+            import tempfile
+            # bufsize=0: readinto() fills the array directly from the pipe.
+            # stderr goes to a temporary file: a pipe that nobody reads while stdout is consumed would
+            # block ffmpeg (and this loop) as soon as it fills up, e.g. with one decode error per packet
+            with tempfile.TemporaryFile() as stderr_file:
+                with subprocess.Popen(extract_cmd, stdout=subprocess.PIPE, stderr=stderr_file, bufsize=0) as process:
+                    received = 0
+                    while received < len(pcm_bytes):
+                        if self.interrupted:
+                            process.kill()
+                            return [None] * len(windows)
+                        count = process.stdout.readinto(pcm_bytes[received:])
+                        if not count:
+                            break
+                        received += count
+                    process.wait()
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+            self.pcm_bytes += received
 
             if process.returncode != 0:
-                self.logger.error(f"Sample extraction error by position {start_percent}:")
+                self.logger.error(f"Sample extraction error by spans {[spans for _, spans in windows]}:")
                 self.logger.error(f"Command: {' '.join(extract_cmd)}")
                 self.logger.error(f"Error: {stderr.decode('utf-8', errors='ignore')}")
-                raise subprocess.CalledProcessError(process.returncode, extract_cmd, stdout, stderr)
-
-            audio_sample.write(stdout)
-            audio_sample.seek(0)
-            return audio_sample
+                raise subprocess.CalledProcessError(process.returncode, extract_cmd, None, stderr)
 
         except Exception as e:
             self.logger.error(f"Sample extraction error: {str(e)}")
-            return None
+            if len(windows) == 1 or self.interrupted:
+                return [None] * len(windows)
+            # One bad window must not cost the others: retry them one by one
+            self.logger.debug("Falling back to one extraction per sample")
+            return [self.extract_audio_samples([window], sample_format)[0] for window in windows]
+
+        # Short read (should not happen thanks to apad): the missing tail is silence
+        pcm[received // pcm.itemsize:] = 0
+
+        samples = []
+        offset = 0
+        for length in lengths:
+            samples.append(pcm[offset:offset + length])
+            offset += length
+        return samples
+
+# State of a --workers pool process, populated by _init_worker
+_worker_state = {}
+
+def _open_cache(cache_settings):
+    """
+    Opens the detection cache described by 'cache_settings' ((path, max entries) or None).
+    """
+    if cache_settings is None:
+        return None
+    path, max_entries = cache_settings
+    return DetectionCache(path, max_entries)
+
+def _handle_stop_signal(signum, frame):
+    """
+    SIGINT/SIGTERM handler: the running analyses stop at their next round and no new file is started,
+    so that the completed work reaches the checkpoint. A second signal aborts at once.
+    """
+    if _stop_requested.is_set():
+        _abort_requested.set()
+        raise KeyboardInterrupt
+    _stop_requested.set()
+    print(f"\n{signal.Signals(signum).name} received, stopping (repeat to abort immediately)...", file=sys.stderr)
+
+def _init_worker(checker_options, cache_settings, extract_threads, checkpoint_path=None, stop_event=None):
+    """
+    Initializer of the --workers pool processes.
+
+    Arguments:
+      checker_options (dict): keyword arguments shared by every AudioMediaChecker of the run.
+      cache_settings (tuple): (path, max entries) of the detection cache, None if disabled.
+      extract_threads (int): background extraction threads of the worker (0 to disable).
+      checkpoint_path (str): checkpoint of the run, already reset by the parent if not resuming (None if disabled).
+      stop_event (multiprocessing.Event): set by the parent when a stop is requested.
+    """
+    global _forwarded_stop
+    # Ctrl-C is handled by the parent, which forwards the stop through 'stop_event': the running analyses
+    # end at their next round. A SIGTERM sent to the worker itself does the same
+    _forwarded_stop = stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _handle_stop_signal)
+
+    options = dict(checker_options)
+    options['logger'] = _setup_logger(options.get('verbose', False), options.get('json_output', False))
+    # Every process opens its own connection to the (shared) cache database
+    options['cache'] = _open_cache(cache_settings)
+    options['pipeline'] = ExtractionPipeline(extract_threads) if extract_threads else None
+    options['checkpoint'] = RunCheckpoint(checkpoint_path, resume=True) if checkpoint_path else None
+    _worker_state['options'] = options
+
+def _process_file_worker(file_path, media_info=None, probe_seconds=0.0):
+    """
+    Analyzes a single file inside a --workers pool process.
+    The Whisper model is loaded once per worker (shared registry) and reused for every file it receives.
+
+    Arguments:
+      file_path (str): file to be analyzed.
+      media_info (dict): stream metadata from the pre-scan, None to probe the file.
+      probe_seconds (float): time the pre-scan took to collect 'media_info'.
+
+    Returns:
+      dict: outcome of the file (see AudioMediaChecker.summary).
+    """
+    checker = AudioMediaChecker(file_path, media_info=media_info, probe_seconds=probe_seconds,
+                                **_worker_state['options'])
+    return checker.summary(checker.process_file())
+
+def _progress_bar(total, json_output):
+    """
+    Returns the files progress bar, or None in json mode (no progress bar).
+    """
+    if json_output:
+        return None
+    from tqdm import tqdm
+    return tqdm(total=total, desc=" - INFO - Processing files", unit="file", initial=1, leave=False)
+
+def _update_progress_bar(pbar, step=0):
+    """
+    Refreshes the timestamp shown by the progress bar and advances it by 'step' files.
+    """
+    if pbar is None:
+        return
+    now = datetime.datetime.now()
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S,%f")[:-3]
+    pbar.set_description(f"{timestamp} - INFO - Processing files")
+    if step:
+        pbar.update(step)
+
+def _iter_files_to_process(args, journal, scan_stats, checkpoint=None, model_size=None):
+    """
+    Yields the files to be analyzed (--file, then the --folder walk), lazily.
+
+    Arguments:
+      args (argparse.Namespace): command line arguments.
+      journal (ScanJournal): journal of the previous runs; unchanged files are skipped (None to disable).
+      scan_stats (dict): updated with the number of files 'found', 'skipped' as unchanged and
+                         'resumed' (completed by the interrupted run).
+      checkpoint (RunCheckpoint): checkpoint of the interrupted run; files completed with 'model_size'
+                                  are skipped (None to disable).
+      model_size (str): Whisper model of the run.
+    """
+    sources = []
+    if args.file:
+        sources.append([Path(args.file)])
+    if args.folder:
+        # If --recursive is not passed, args.recursive will be None,
+        # and then a NON-recursive search will be done (only in the source directory)
+        sources.append(find_files(Path(args.folder), args.recursive, dry_run=args.dry_run))
+
+    for file_path in itertools.chain.from_iterable(sources):
+        scan_stats['found'] += 1
+        if journal is not None and journal.is_unchanged(file_path, args.dry_run):
+            scan_stats['skipped'] += 1
+            continue
+        if checkpoint is not None and checkpoint.is_done(file_path, args.dry_run, model_size):
+            scan_stats['resumed'] += 1
+            continue
+        yield file_path
+
+def _process_files_serial(files_to_process, checker_options, logger, json_output, cache_settings=None,
+                          extract_threads=0, checkpoint=None):
+    """
+    Analyzes the files one after the other in the current process.
+    'files_to_process' yields (file_path, media_info, probe_seconds) tuples, media_info None if not pre-scanned.
+
+    With extraction threads, while a file is analyzed the next one is already probed and the
+    first round of its samples extracted in background. No new file is started once a stop is requested.
+
+    Yields:
+      dict: outcome of each file (see AudioMediaChecker.summary), in order.
+    """
+    pbar = _progress_bar(None, json_output)
+    cache = _open_cache(cache_settings)
+    pipeline = ExtractionPipeline(extract_threads) if extract_threads else None
+
+    def build_checker(item):
+        file_path, media_info, probe_seconds = item
+        checker = AudioMediaChecker(str(file_path), logger=logger, cache=cache, pipeline=pipeline,
+                                    media_info=media_info, probe_seconds=probe_seconds, checkpoint=checkpoint,
+                                    **checker_options)
+        checker.prefetch()
+        return checker
+
+    try:
+        if pipeline is None:
+            for item in files_to_process:
+                if _stop_requested.is_set():
+                    break
+                _update_progress_bar(pbar)
+                checker = build_checker(item)
+                result = checker.summary(checker.process_file())
+                _update_progress_bar(pbar, 1)
+                yield result
+        else:
+            items = iter(files_to_process)
+            item = next(items, None)
+            upcoming = pipeline.executor.submit(build_checker, item) if item is not None else None
+            while upcoming is not None and not _stop_requested.is_set():
+                _update_progress_bar(pbar)
+                checker = upcoming.result()
+                item = next(items, None)
+                upcoming = pipeline.executor.submit(build_checker, item) if item is not None else None
+
+                result = checker.summary(checker.process_file())
+                _update_progress_bar(pbar, 1)
+                yield result
+    finally:
+        if pipeline is not None:
+            pipeline.shutdown()
+        if cache is not None:
+            cache.close()
+        if pbar is not None:
+            pbar.close()
+
+def _process_files_parallel(files_to_process, checker_options, workers, json_output, cache_settings=None,
+                            extract_threads=0, checkpoint_path=None):
+    """
+    Analyzes the files with a pool of 'workers' processes, each one with its own Whisper model.
+    'files_to_process' yields (file_path, media_info, probe_seconds) tuples, media_info None if not pre-scanned.
+    Files are submitted while they are discovered, keeping at most two per worker in flight.
+    Once a stop is requested no new file is submitted, the files not started yet are dropped and the
+    running ones end at their next round; after a second signal the workers are killed.
+
+    Yields:
+      dict: outcome of each file (see AudioMediaChecker.summary), in input order.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    pbar = _progress_bar(None, json_output)
+    # spawn: every worker starts clean, without inheriting threads or CUDA state from the parent
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    # Processes already running belong to someone else: only the ones started by the pool are killed on abort
+    other_children = set(multiprocessing.active_children())
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(checker_options, cache_settings, extract_threads, checkpoint_path, stop_event)
+    )
+    # The signal handler only sets the local event (a multiprocessing Event is not safe to set
+    # from a handler): a thread forwards it to the workers
+    def forward_stop():
+        _stop_requested.wait()
+        stop_event.set()
+
+    threading.Thread(target=forward_stop, daemon=True).start()
+    in_flight = collections.deque()
+    try:
+        _update_progress_bar(pbar)
+        for file_path, media_info, probe_seconds in files_to_process:
+            if _stop_requested.is_set():
+                break
+            in_flight.append(executor.submit(_process_file_worker, str(file_path), media_info, probe_seconds))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+                _update_progress_bar(pbar, 1)
+        while in_flight:
+            future = in_flight.popleft()
+            # After a stop request the files not started yet are left to the resumed run
+            if _stop_requested.is_set() and future.cancel():
+                continue
+            yield future.result()
+            _update_progress_bar(pbar, 1)
+    finally:
+        if _abort_requested.is_set():
+            # Aborted: nothing else is waited for, the checkpoint keeps what was completed
+            for process in multiprocessing.active_children():
+                if process not in other_children:
+                    process.kill()
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if pbar is not None:
+            pbar.close()
+
+def _print_json_results(json_results):
+    """
+    Prints the json results of a file (only if there is something to print).
+    """
+    if json_results:
+        print(json.dumps(json_results, indent=2))
+
+class AnalysisServer:
+    """
+    --serve mode: a long-running process that keeps the Whisper model warm and analyzes the files
+    submitted over HTTP, so that every import hook does not pay startup, imports and model load.
+
+    POST /analyze with {"file": "<path>"} queues a job and answers when it is done, with the same
+    JSON the CLI prints in --json mode. GET /health reports the queue. The jobs run in 'concurrency'
+    threads sharing the model, the detection cache and the extraction pipeline.
+    """
+    def __init__(self, address, checker_options, logger, concurrency=1, cache_settings=None, extract_threads=0):
+        """
+        Arguments:
+          address (tuple): (host, port) to listen on.
+          checker_options (dict): keyword arguments of every AudioMediaChecker.
+          logger (logging.Logger): logger of the server and of the analyses.
+          concurrency (int): files analyzed at the same time.
+          cache_settings (tuple): (path, max entries) of the detection cache, None if disabled.
+          extract_threads (int): background extraction threads (0 to disable).
+        """
+        self.checker_options = dict(checker_options, json_output=True)
+        self.logger = logger
+        self.concurrency = max(1, concurrency)
+        self.cache = _open_cache(cache_settings)
+        self.pipeline = ExtractionPipeline(extract_threads) if extract_threads else None
+        self.jobs = queue.Queue()
+        self.running = 0
+        self._running_lock = threading.Lock()
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        handler = type('AnalysisRequestHandler', (_AnalysisRequestHandler, BaseHTTPRequestHandler), {})
+        self.httpd = ThreadingHTTPServer(address, handler)
+        self.httpd.daemon_threads = True
+        self.httpd.analysis_server = self
+
+    def submit(self, file_path):
+        """
+        Queues the analysis of a file.
+
+        Returns:
+          dict: the job; its 'done' event is set when 'result' (AudioMediaChecker.summary) or 'error' is available.
+        """
+        job = {'file': file_path, 'done': threading.Event(), 'result': None, 'error': None}
+        self.jobs.put(job)
+        return job
+
+    def _run_jobs(self):
+        while True:
+            job = self.jobs.get()
+            with self._running_lock:
+                self.running += 1
+            try:
+                checker = AudioMediaChecker(job['file'], logger=self.logger, cache=self.cache,
+                                            pipeline=self.pipeline, **self.checker_options)
+                job['result'] = checker.summary(checker.process_file())
+            except Exception as e:
+                self.logger.error(f"Error analyzing {job['file']}: {str(e)}")
+                job['error'] = str(e)
+            finally:
+                with self._running_lock:
+                    self.running -= 1
+                job['done'].set()
+
+    def serve_forever(self):
+        """
+        Loads the model, starts the job threads and serves requests until interrupted.
+        """
+        key = AudioMediaChecker.whisper_key(self.checker_options.get('model', 'base'),
+                                            self.checker_options.get('gpu', False),
+                                            self.checker_options.get('cpu_threads'),
+                                            self.checker_options.get('compute_type'))
+        load_whisper_model(key, self.logger)
+
+        for _ in range(self.concurrency):
+            threading.Thread(target=self._run_jobs, daemon=True).start()
+
+        host, port = self.httpd.server_address[:2]
+        self.logger.info(f"Serving on http://{host}:{port} ({self.concurrency} concurrent "
+                         f"{'analyses' if self.concurrency > 1 else 'analysis'})")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+            if self.pipeline is not None:
+                self.pipeline.shutdown()
+            if self.cache is not None:
+                self.cache.close()
+
+class _AnalysisRequestHandler:
+    """
+    Request handling of AnalysisServer, combined with http.server.BaseHTTPRequestHandler
+    when the server starts (so http.server is imported only in --serve mode).
+    """
+    def do_GET(self):
+        if self.path != '/health':
+            self._reply(404, {'error': 'Not found'})
+            return
+        server = self.server.analysis_server
+        self._reply(200, {'status': 'ok', 'queued': server.jobs.qsize(), 'running': server.running})
+
+    def do_POST(self):
+        if self.path != '/analyze':
+            self._reply(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            file_path = json.loads(self.rfile.read(length))['file']
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {'error': 'Expected a JSON body like {"file": "<path>"}'})
+            return
+
+        job = self.server.analysis_server.submit(file_path)
+        job['done'].wait()
+        if job['error'] is not None:
+            self._reply(400, {'file': file_path, 'error': job['error']})
+        else:
+            # Same outcome as the CLI: a file without results (no audio track, nothing analyzed)
+            # is not an error, the CLI prints nothing and exits 0
+            self._reply(200, job['result']['json_results'])
+
+    def _reply(self, status, body):
+        data = json.dumps(body, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        self.server.analysis_server.logger.debug(f"{self.address_string()} - {format % args}")
+
+def _parse_address(address):
+    """
+    Returns (host, port) from 'host:port' (or just 'port').
+    """
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+def submit_to_server(server_url, file_path):
+    """
+    Thin client of --serve: submits a file and waits for the result.
+
+    Returns:
+      tuple: (True if the analysis succeeded, decoded JSON response)
+    """
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(
+        server_url.rstrip('/') + '/analyze',
+        data=json.dumps({'file': str(file_path)}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return True, json.load(response)
+    except urllib.error.HTTPError as e:
+        return False, json.load(e)
 
 def main():
     checker = None
@@ -668,19 +3143,81 @@ def main():
                             help=f"Whisper model (size): {' '.join(VALID_MODELS)}, default: %(default)s")
         parser.add_argument('--gpu', action='store_true', help='Use GPU for language detection (optional)')
         parser.add_argument('--help-languages', action='store_true', help='Show a list of available language codes')
+        parser.add_argument('--batch-size', type=int, default=8,
+                            help='Maximum number of samples analyzed together in one encoder pass (default: 8)')
+        parser.add_argument('--cache', nargs='?', const=str(DEFAULT_CACHE_PATH),
+                            help=f'Cache ffprobe results and detections in a SQLite database, so unchanged tracks are answered instantly (default path: {DEFAULT_CACHE_PATH})')
+        parser.add_argument('--cache-size', type=int, default=100000,
+                            help='Maximum number of entries kept in each table of the cache (stream information, detections, fingerprints), least recently used are evicted (default: 100000)')
+        parser.add_argument('--since-last-run', nargs='?', const=str(DEFAULT_JOURNAL_PATH),
+                            help=f'Incremental scan: skip the files not modified since they were processed (fully tagged, or with the same options), using a journal (default path: {DEFAULT_JOURNAL_PATH})')
+        parser.add_argument('--checkpoint', nargs='?', const=str(DEFAULT_CHECKPOINT_PATH),
+                            help=f'Record every track verdict and file outcome as soon as it is known in an append-only JSONL checkpoint, flushed to disk (default path: {DEFAULT_CHECKPOINT_PATH})')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an interrupted run from its --checkpoint: completed files are skipped and concluded tracks are not analyzed again')
+        parser.add_argument('--activity-map', action='store_true',
+                            help='Rank the sample windows by speech activity (one extra low sample rate read of the audio), analyze the most speech-dense first and fill them with speech only')
+        parser.add_argument('--dedup', action='store_true',
+                            help='Reuse the verdict of tracks with identical audio (fingerprint of the first samples), in the same run or, with --cache, across runs')
+        parser.add_argument('--native-probe', action='store_true',
+                            help='Read MKV/WebM track information directly from the file header, ffprobe is used only as fallback')
+        parser.add_argument('--probe-threads', type=int, default=4,
+                            help='Parallel lightweight ffprobe pre-scan that drops files with nothing to analyze, 0 to disable (default: 4)')
+        parser.add_argument('--extract-threads', type=int, default=2,
+                            help='Background ffmpeg extraction threads overlapping with inference, 0 to disable (default: 2)')
+        parser.add_argument('--metrics', action='store_true',
+                            help='In json mode, add the per-stage metrics of every track (probe and model load ms, extraction runs, PCM bytes, inference ms per sample, attempts, confidence)')
+        parser.add_argument('--prometheus-textfile',
+                            help='Write the totals of the run to this file in the Prometheus textfile collector format')
+        parser.add_argument('--schedule', choices=['none', 'sjf', 'balanced'], default='none',
+                            help='Order of the files: none (as found), sjf (shortest expected first) or balanced (longest first, evens out the --workers) (default: none)')
+        parser.add_argument('--time-budget', type=float,
+                            help='Stop starting new files after this many seconds; use with --since-last-run to continue on the next run')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of files analyzed in parallel, each worker loads its own Whisper model; 0 to choose from the CPU cores and memory (default: 1). Reduced if they do not fit in the available memory')
+        parser.add_argument('--cascade', choices=['tiny', 'base'],
+                            help='Classify the samples with this smaller model first; --model is used only for the tracks where it is not confident enough')
+        parser.add_argument('--cascade-margin', type=int, default=10,
+                            help='Percentage points above --confidence the --cascade model must reach to be trusted (default: 10)')
+        parser.add_argument('--degrade-model', action='store_true',
+                            help='If the model does not fit in the available memory, use the largest smaller one instead of failing')
+        parser.add_argument('--serve', nargs='?', const='127.0.0.1:8765', metavar='HOST:PORT',
+                            help='Run as a service with the model kept loaded: files are submitted with POST /analyze {"file": "<path>"} (default address: 127.0.0.1:8765)')
+        parser.add_argument('--serve-concurrency', type=int, default=1,
+                            help='Files analyzed at the same time in --serve mode (default: 1)')
+        parser.add_argument('--server', metavar='URL',
+                            help='Submit --file to a --serve instance (e.g. http://127.0.0.1:8765) and print its JSON result')
 
         args = parser.parse_args()
 
         logger = _setup_logger(args.verbose, args.json)
 
         if args.help_languages:
+            import pycountry
             print("Available language codes (ISO 639-2 format):")
             for language in pycountry.languages:
                 if hasattr(language, 'alpha_3'):
                     print(f"{language.alpha_3} - {language.name}")
             sys.exit(0)
 
-        if not args.file and not args.folder:
+        if args.server:
+            if not args.file or args.folder:
+                parser.error("--server requires --file (and no --folder)")
+            # The analysis options are the ones of the server
+            success, response = submit_to_server(args.server, Path(args.file).resolve())
+            if success:
+                _print_json_results(response)
+            else:
+                print(json.dumps(response, indent=2))
+            sys.exit(0 if success else 1)
+
+        if args.serve and (args.file or args.folder):
+            parser.error("--serve cannot be used with --file or --folder")
+
+        if args.serve and (args.checkpoint or args.resume):
+            parser.error("--checkpoint and --resume cannot be used with --serve")
+
+        if not args.file and not args.folder and not args.serve:
             parser.error("the following arguments are required: --file or --folder")
 
         # Check incompatibility between --verbose and --json
@@ -690,6 +3227,7 @@ def main():
         # Forced language code validation
         if args.force_language:
             if args.force_language != '':
+                import pycountry
                 language_obj = pycountry.languages.get(alpha_3=args.force_language)
                 if language_obj is not None:
                     logger.debug(f"Forced language set to: {args.force_language} -> {language_obj.name}")
@@ -705,7 +3243,17 @@ def main():
             print("Error: the confidence threshold should be between 1 and 100")
             sys.exit(1)
 
-        files_to_process = []
+        if args.workers < 0:
+            print("Error: the number of workers cannot be negative")
+            sys.exit(1)
+
+        if args.time_budget is not None and args.time_budget <= 0:
+            print("Error: the time budget should be greater than 0")
+            sys.exit(1)
+
+        if args.extract_threads < 0 or args.probe_threads < 0:
+            print("Error: the number of extraction/probe threads cannot be negative")
+            sys.exit(1)
 
         if args.file:
             file_path = Path(args.file)
@@ -713,33 +3261,65 @@ def main():
             if not args.dry_run and file_path.suffix.lower() != '.mkv':
                 print(f"Error: the file must be in MKV format. File provided: {file_path}")
                 sys.exit(1)
-            files_to_process.append(file_path)
 
         if args.folder:
             folder_path = Path(args.folder)
             if not folder_path.is_dir():
                 print(f"Error: '{folder_path}' is not a valid directory.")
                 sys.exit(1)
-            
-            # If --recursive is not passed, args.recursive will be None,
-            # and then a NON-recursive search will be done (only in the source directory)
-            if args.recursive is None:
-                # In this case we consider only the indicated directory (no recursion)
-                if args.dry_run:
-                    # In dry-run I look for all video formats
-                    extensions = ['*.mkv', '*.mp4', '*.avi', '*.mov', '*.m4v', '*.flv', '*.wmv', '*.webm']
-                    for ext in extensions:
-                        files_to_process.extend(list(folder_path.glob(ext)))
-                else:
-                    # In normal mode I only search for mkv
-                    files_to_process.extend(list(folder_path.glob('*.mkv')))
-            else:
-                depth = args.recursive
-                files_to_process.extend(find_files(folder_path, depth, dry_run=args.dry_run))
 
-        if not files_to_process:
-            print("No MKV files found.")
-            sys.exit(1)
+        # Model, compute type, threads and workers sized on the available memory and CPU cores
+        # (--serve runs a single model, shared by its analyses)
+        plan = plan_resources(args.model, args.gpu, 1 if args.serve else args.workers,
+                              degrade_model=args.degrade_model, cascade_model=args.cascade)
+        for note in plan['notes']:
+            logger.warning(note)
+        cascade_model = args.cascade
+        if cascade_model and MODEL_MEMORY_GB[cascade_model] >= MODEL_MEMORY_GB[plan['model']]:
+            logger.warning(f"Cascade disabled: model '{cascade_model}' is not smaller than '{plan['model']}'")
+            cascade_model = None
+        logger.debug(f"Resource plan: model={plan['model']}, compute_type={plan['compute_type']}, "
+                     f"threads per model={plan['cpu_threads'] or 'auto'}, workers={plan['workers']}")
+        workers = plan['workers']
+
+        cache_settings = (args.cache, args.cache_size) if args.cache else None
+        journal = None
+        if args.since_last_run:
+            journal = ScanJournal(args.since_last_run, {
+                'check_all_tracks': args.check_all_tracks,
+                'model': plan['model'],
+                'confidence': args.confidence,
+                'force_language': args.force_language
+            })
+        # --resume without a path continues the default checkpoint
+        checkpoint_path = args.checkpoint or (str(DEFAULT_CHECKPOINT_PATH) if args.resume else None)
+        checkpoint = RunCheckpoint(checkpoint_path, resume=args.resume) if checkpoint_path else None
+        scan_stats = {'found': 0, 'skipped': 0, 'resumed': 0}
+        files_to_process = _iter_files_to_process(args, journal, scan_stats, checkpoint, plan['model'])
+
+        if args.probe_threads:
+            def skip_file(file_path, media_info):
+                # Nothing to analyze: recorded as done, so --since-last-run will not probe it again
+                scan_stats['prescan_skipped'] += 1
+                logger.debug(f"Pre-scan: no audio track to analyze in {file_path}")
+                if journal is not None:
+                    journal.record(file_path, count_untagged_audio(media_info)[1], args.dry_run)
+                if checkpoint is not None:
+                    checkpoint.record_file(file_path, True, count_untagged_audio(media_info)[1], args.dry_run,
+                                           plan['model'])
+
+            scan_stats['prescan_skipped'] = 0
+            files_to_process = prescan_files(files_to_process, args.probe_threads, args.check_all_tracks,
+                                             cache_settings, skip_file, args.native_probe)
+        else:
+            files_to_process = ((file_path, None, 0.0) for file_path in files_to_process)
+
+        if args.schedule != 'none':
+            files_to_process = schedule_files(files_to_process, args.schedule, args.check_all_tracks,
+                                              args.activity_map)
+        if args.time_budget:
+            files_to_process = within_time_budget(files_to_process, time.monotonic() + args.time_budget,
+                                                  scan_stats)
 
         if args.verbose:
             params = {
@@ -749,51 +3329,123 @@ def main():
                 'confidence_threshold': args.confidence,
                 'model': args.model,
                 'gpu': args.gpu,
-                'json_output': args.json
+                'json_output': args.json,
+                'batch_size': args.batch_size,
+                'cache': args.cache if args.cache else 'False',
+                'since_last_run': args.since_last_run if args.since_last_run else 'False',
+                'checkpoint': checkpoint_path if checkpoint_path else 'False',
+                'resume': args.resume,
+                'activity_map': args.activity_map,
+                'dedup': args.dedup,
+                'native_probe': args.native_probe,
+                'probe_threads': args.probe_threads,
+                'extract_threads': args.extract_threads,
+                'metrics': args.metrics,
+                'serve': args.serve if args.serve else 'False',
+                'prometheus_textfile': args.prometheus_textfile if args.prometheus_textfile else 'False',
+                'schedule': args.schedule,
+                'time_budget': args.time_budget if args.time_budget else 'False',
+                'workers': args.workers if args.workers else 'auto',
+                'degrade_model': args.degrade_model,
+                'cascade': f"{args.cascade} (margin {args.cascade_margin}%)" if args.cascade else 'False'
             }
             logger.info("Execution parameters:")
             for param, value in params.items():
                 logger.info(f"  {param}: {value}")
             logger.info("--" * 30)
 
-        # Progress bar visible only if NOT in json mode
-        if not args.json:
-            with tqdm(total=len(files_to_process), desc=" - INFO - Processing files", unit="file", initial=1, leave=False) as pbar:
-                for file_path in files_to_process:
-                    now = datetime.datetime.now()
-                    timestamp = now.strftime("%Y-%m-%d %H:%M:%S,%f")[:-3]
-                    pbar.set_description(f"{timestamp} - INFO - Processing files")
-
-                    checker = AudioMediaChecker(
-                        str(file_path),
-                        check_all_tracks=args.check_all_tracks,
-                        verbose=args.verbose,
-                        dry_run=args.dry_run,
-                        force_language=args.force_language,
-                        confidence_threshold=args.confidence,
-                        model=args.model,
-                        gpu=args.gpu,
-                        logger=logger,
-                        json_output=args.json
-                    )
-                    checker.process_file()
-                    pbar.update(1)
+        checker_options = {
+            'check_all_tracks': args.check_all_tracks,
+            'verbose': args.verbose,
+            'dry_run': args.dry_run,
+            'force_language': args.force_language,
+            'confidence_threshold': args.confidence,
+            'model': plan['model'],
+            'gpu': args.gpu,
+            'compute_type': plan['compute_type'],
+            'cpu_threads': plan['cpu_threads'] or None,
+            'json_output': args.json,
+            'batch_size': args.batch_size,
+            'native_probe': args.native_probe,
+            'activity_map': args.activity_map,
+            'metrics': args.metrics,
+            'dedup': args.dedup,
+            'cascade_model': cascade_model,
+            'cascade_margin': args.cascade_margin
+        }
+
+        if args.serve:
+            server = AnalysisServer(_parse_address(args.serve), checker_options, logger, args.serve_concurrency,
+                                    cache_settings, args.extract_threads)
+            server.serve_forever()
+            return
+
+        # Ctrl-C/SIGTERM: the running analyses stop at their next round and what is completed is recorded
+        signal.signal(signal.SIGINT, _handle_stop_signal)
+        signal.signal(signal.SIGTERM, _handle_stop_signal)
+
+        if workers > 1:
+            if args.gpu:
+                logger.warning(f"{workers} workers will each load a copy of the model on the GPU")
+            results = _process_files_parallel(files_to_process, checker_options, workers, args.json,
+                                              cache_settings, args.extract_threads, checkpoint_path)
         else:
-            # Json mode: no progress bar
-            for file_path in files_to_process:
-                checker = AudioMediaChecker(
-                    str(file_path),
-                    check_all_tracks=args.check_all_tracks,
-                    verbose=args.verbose,
-                    dry_run=args.dry_run,
-                    force_language=args.force_language,
-                    confidence_threshold=args.confidence,
-                    model=args.model,
-                    gpu=args.gpu,
-                    logger=logger,
-                    json_output=args.json
-                )
-                checker.process_file()
+            results = _process_files_serial(files_to_process, checker_options, logger, args.json,
+                                            cache_settings, args.extract_threads, checkpoint)
+
+        header_rewrites = 0
+        escalated_samples = 0
+        run_metrics = RunMetrics() if args.prometheus_textfile else None
+        try:
+            for result in results:
+                header_rewrites += result['header_rewrites']
+                escalated_samples += result['metrics']['escalated_samples']
+                if run_metrics is not None:
+                    run_metrics.add(result)
+                if args.json:
+                    _print_json_results(result['json_results'])
+                # Failed files are left out of the journal, so the next run retries them
+                if journal is not None and result['success']:
+                    journal.record(result['file'], result['untagged_tracks'], args.dry_run)
+                if checkpoint is not None:
+                    checkpoint.record_file(result['file'], result['success'], result['untagged_tracks'], args.dry_run,
+                                           plan['model'])
+        finally:
+            # Ends the processing at once on Ctrl-C (pool and pipeline shut down)
+            results.close()
+            if journal is not None:
+                journal.save()
+            if checkpoint is not None:
+                checkpoint.close()
+            if run_metrics is not None:
+                run_metrics.write_textfile(args.prometheus_textfile)
+
+        if _stop_requested.is_set():
+            logger.info("Run interrupted: the completed files and tracks are recorded in the checkpoint, "
+                        "restart with --resume to continue" if checkpoint is not None
+                        else "Run interrupted (use --checkpoint to be able to resume it)")
+            print("\nOperation aborted by user.")
+            sys.exit(1)
+
+        if not scan_stats['found']:
+            print("No MKV files found.")
+            sys.exit(1)
+
+        if journal is not None:
+            logger.info(f"Incremental scan: {scan_stats['skipped']} unchanged files skipped, "
+                        f"{scan_stats['found'] - scan_stats['skipped']} scanned")
+        if args.resume:
+            logger.info(f"Resume: {scan_stats['resumed']} files completed by the interrupted run skipped")
+        if args.probe_threads:
+            logger.info(f"Pre-scan: {scan_stats['prescan_skipped']} files without audio tracks to analyze skipped")
+        if not args.dry_run:
+            logger.info(f"MKV header rewrites: {header_rewrites}")
+        if cascade_model:
+            logger.info(f"Cascade: {escalated_samples} samples analyzed by '{plan['model']}' after escalation")
+        if scan_stats.get('budget_reached'):
+            deferred = f"{scan_stats['deferred']} files" if 'deferred' in scan_stats else "the remaining files"
+            logger.info(f"Time budget of {args.time_budget:g}s reached: {deferred} left for the next run"
+                        + ("" if journal is not None else " (use --since-last-run to skip the files already done)"))
 
         logger.info("Script successfully completed.")
         sys.exit(0)
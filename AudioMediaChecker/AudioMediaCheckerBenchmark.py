@@ -0,0 +1,274 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import AudioMediaChecker as checker_module
+from AudioMediaChecker import AudioMediaChecker, _setup_logger
+
+# Synthetic track kinds: lavfi sources that need no stored media
+TRACK_SOURCES = {
+    'tone': 'sine=frequency={frequency}:sample_rate=48000:duration={duration}',
+    'noise': 'anoisesrc=color=pink:amplitude=0.3:sample_rate=48000:duration={duration}',
+    'silence': 'anullsrc=channel_layout=stereo:sample_rate=48000,atrim=duration={duration}'
+}
+
+def build_fixture(output_path, duration, tracks, speech_clips=()):
+    """
+    Generates a synthetic MKV with one untagged audio track per source, using ffmpeg only.
+
+    Arguments:
+      output_path (Path): MKV to create.
+      duration (int): duration of the file in seconds.
+      tracks (list): synthetic track kinds (keys of TRACK_SOURCES).
+      speech_clips (list): stored speech clips, each looped over the whole file as one more track.
+
+    Returns:
+      Path: the created file.
+    """
+    cmd = ['ffmpeg', '-y', '-nostdin', '-hide_banner', '-loglevel', 'error']
+    for i, kind in enumerate(tracks):
+        cmd += ['-f', 'lavfi', '-i', TRACK_SOURCES[kind].format(frequency=220 * (i + 1), duration=duration)]
+    for clip in speech_clips:
+        cmd += ['-stream_loop', '-1', '-i', str(clip)]
+
+    for i in range(len(tracks) + len(speech_clips)):
+        cmd += ['-map', f'{i}:a:0']
+    cmd += [
+        '-t', str(duration),
+        '-c:a', 'aac', '-b:a', '96k',
+        '-metadata:s:a', 'language=und',
+        str(output_path)
+    ]
+    subprocess.run(cmd, check=True)
+    return output_path
+
+def time_call(fn, repeat):
+    """
+    Calls 'fn' 'repeat' times.
+
+    Returns:
+      tuple: (list of durations in seconds, result of the last call)
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+def _record(results, stage, fixture, timings, **details):
+    """
+    Appends the summary of the timings of one stage to the results.
+    """
+    results.append({
+        'stage': stage,
+        'fixture': fixture.name,
+        **details,
+        'runs': len(timings),
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+        'seconds': timings
+    })
+
+def benchmark_startup(repeat):
+    """
+    Times the startup paths of the script in fresh interpreters (the cost paid by every hook call),
+    and lists the slowest imports of the module (python -X importtime).
+
+    Returns:
+      list: one record per startup path, plus the 'import_breakdown' record.
+    """
+    script = Path(__file__).with_name('AudioMediaChecker.py')
+    commands = {
+        'import': [sys.executable, '-c', 'import AudioMediaChecker'],
+        'help': [sys.executable, str(script), '--help'],
+        'help_languages': [sys.executable, str(script), '--help-languages']
+    }
+    results = []
+    for name, cmd in commands.items():
+        timings, _ = time_call(
+            lambda: subprocess.run(cmd, cwd=script.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+            repeat
+        )
+        results.append({'stage': 'startup', 'command': name, 'runs': len(timings), 'min': min(timings),
+                        'median': statistics.median(timings), 'max': max(timings), 'seconds': timings})
+
+    # "import time: self [us] | cumulative | imported package" lines, top-level packages only
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import AudioMediaChecker'],
+                            cwd=script.parent, capture_output=True, text=True).stderr
+    imports = []
+    for line in output.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit() and '.' not in fields[2]:
+            imports.append((fields[2].strip(), int(fields[1]) / 1e6))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    results.append({'stage': 'import_breakdown',
+                    'slowest': [{'module': module, 'cumulative_seconds': seconds} for module, seconds in imports[:10]]})
+    return results
+
+def benchmark_fixture(fixture, models, threads, repeat, logger):
+    """
+    Times the stages of process_file separately on one fixture.
+
+    Arguments:
+      fixture (Path): MKV to analyze.
+      models (list): Whisper model sizes.
+      threads (list): CPU inference thread counts.
+      repeat (int): runs per measurement.
+      logger (logging.Logger): logger passed to the checkers.
+
+    Returns:
+      list: one record per stage and configuration.
+    """
+    results = []
+    checker = AudioMediaChecker(fixture, dry_run=True, logger=logger, model=models[0])
+    audio_streams = [s for s in checker.media_info['streams'] if s['codec_type'] == 'audio']
+
+    # Stream information: ffprobe and the native Matroska reader
+    for native_probe in (False, True):
+        checker.native_probe = native_probe
+        timings, _ = time_call(checker.get_media_info, repeat)
+        _record(results, 'get_media_info', fixture, timings, native_probe=native_probe)
+    checker.native_probe = False
+
+    # Extraction: one window, and one round (two windows per track) with a single ffmpeg run
+    context = checker.window_policy.context_seconds
+    for sample_format in ('f32le', 's16le'):
+        timings, _ = time_call(lambda: checker.extract_audio_sample(0, 50, context, sample_format), repeat)
+        _record(results, 'extract_audio_sample', fixture, timings, sample_format=sample_format)
+
+    windows = [
+        (position, checker.window_policy.spans(checker.total_duration * percent / 100, checker.total_duration))
+        for position in range(len(audio_streams))
+        for percent in (25, 75)
+    ]
+    timings, _ = time_call(lambda: checker.extract_audio_samples(windows), repeat)
+    _record(results, 'extract_audio_samples', fixture, timings, windows=len(windows))
+
+    samples = [checker.extract_audio_sample(position, 50, context) for position in range(len(audio_streams))]
+
+    # Inference: every model with every thread count, the load is measured apart from the warm runs
+    for model in models:
+        for cpu_threads in threads:
+            try:
+                model_checker = AudioMediaChecker(fixture, dry_run=True, logger=logger, model=model,
+                                                  cpu_threads=cpu_threads, media_info=checker.media_info)
+                model_checker._lazy_load_whisper()
+            except MemoryError as e:
+                logger.warning(f"Skipping model '{model}': {str(e)}")
+                break
+            details = {'model': model, 'threads': cpu_threads}
+            results.append({'stage': 'model_load', 'fixture': fixture.name, **details,
+                            'seconds': model_checker.model_load_seconds})
+
+            timings, _ = time_call(lambda: model_checker.detect_language(samples[0]), repeat)
+            _record(results, 'detect_language', fixture, timings, **details)
+
+            timings, _ = time_call(lambda: model_checker.detect_languages(samples), repeat)
+            _record(results, 'detect_languages', fixture, timings, samples=len(samples), **details)
+
+            # One model at a time in memory
+            with checker_module._whisper_models_lock:
+                checker_module._whisper_models.clear()
+
+    # Tag update: every track of a fresh copy with one mkvpropedit run (the copy is not timed)
+    if shutil.which('mkvpropedit'):
+        timings = []
+        for _ in range(repeat):
+            copy_path = fixture.with_name(f'{fixture.stem}.tagging.mkv')
+            shutil.copyfile(fixture, copy_path)
+            tag_checker = AudioMediaChecker(copy_path, logger=logger, media_info=checker.media_info)
+            start = time.perf_counter()
+            for stream in audio_streams:
+                tag_checker.update_language_tag(stream['index'], 'eng')
+            tag_checker.apply_language_tags()
+            timings.append(time.perf_counter() - start)
+            copy_path.unlink()
+        _record(results, 'update_language_tag', fixture, timings, tracks=len(audio_streams))
+    else:
+        logger.warning("mkvpropedit not found, tag update not measured")
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the stages of AudioMediaChecker on synthetic MKV files')
+    parser.add_argument('--output', help='JSON file where the results are written (default: stdout)')
+    parser.add_argument('--models', nargs='+', default=['tiny', 'base'],
+                        help='Whisper models to measure (default: %(default)s)')
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 4],
+                        help='CPU inference thread counts to measure (default: %(default)s)')
+    parser.add_argument('--durations', nargs='+', type=int, default=[600, 3600],
+                        help='Duration in seconds of the generated fixtures (default: %(default)s)')
+    parser.add_argument('--tracks', nargs='+', choices=sorted(TRACK_SOURCES), default=['tone', 'noise'],
+                        help='Synthetic audio tracks of every fixture (default: %(default)s)')
+    parser.add_argument('--speech-clip', action='append', default=[],
+                        help='Stored speech clip added (looped) as one more track, can be repeated')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs of every measurement (default: %(default)s)')
+    parser.add_argument('--startup-only', action='store_true',
+                        help='Only measure the startup time (no fixtures, no models)')
+    parser.add_argument('--workdir', help='Directory of the fixtures (default: a temporary directory, removed at the end)')
+    parser.add_argument('--verbose', action='store_true', help='Enable detailed logging')
+    args = parser.parse_args()
+
+    # Without --output the JSON goes to stdout, so the logs are silenced
+    logger = _setup_logger(args.verbose, json=not args.output)
+    if args.repeat < 1:
+        parser.error("--repeat should be at least 1")
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count()
+        },
+        'settings': {
+            'models': args.models,
+            'threads': args.threads,
+            'durations': args.durations,
+            'tracks': args.tracks,
+            'speech_clips': [Path(clip).name for clip in args.speech_clip],
+            'repeat': args.repeat
+        },
+        'results': []
+    }
+    logger.info("Benchmarking startup...")
+    report['results'] += benchmark_startup(args.repeat)
+
+    workdir = None
+    if not args.startup_only:
+        workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix='audiomediachecker-bench-'))
+        workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        for duration in ([] if args.startup_only else args.durations):
+            fixture = workdir / f'fixture_{duration}s_{len(args.tracks) + len(args.speech_clip)}tracks.mkv'
+            if not fixture.exists():
+                logger.info(f"Generating {fixture.name}...")
+                build_fixture(fixture, duration, args.tracks, args.speech_clip)
+            logger.info(f"Benchmarking {fixture.name}...")
+            report['results'] += benchmark_fixture(fixture, args.models, args.threads, args.repeat, logger)
+    finally:
+        if workdir is not None and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n')
+        logger.info(f"Results written to {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()